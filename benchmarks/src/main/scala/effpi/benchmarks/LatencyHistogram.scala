@@ -0,0 +1,106 @@
+// Effpi - verified message-passing programs in Dotty
+// Copyright 2019 Alceste Scalas and Elias Benussi
+// Released under the MIT License: https://opensource.org/licenses/MIT
+package effpi.benchmarks
+
+import java.nio.{ByteBuffer, ByteOrder}
+import java.nio.file.{Files, Path, Paths}
+import java.util.concurrent.atomic.AtomicLongArray
+import scala.jdk.CollectionConverters._
+
+/** Mergeable histogram of latencies (in nanoseconds), with fixed HDR-style
+  * buckets.
+  *
+  * Values below `2 * HALF` have one bucket each; above that, each power of
+  * two is split into `HALF` buckets, giving a relative error below
+  * `1 / HALF`.  Since bucket boundaries are fixed, histograms of different
+  * runs can be merged by summing bucket counts.  Recording is thread-safe.
+  */
+class LatencyHistogram {
+  import LatencyHistogram._
+
+  private val counts = new AtomicLongArray(BUCKETS)
+
+  /** Record a latency, in nanoseconds (negative values count as 0). */
+  def record(nanosecs: Long): Unit = {
+    counts.incrementAndGet(bucket(nanosecs max 0L))
+  }
+
+  /** Total number of recorded latencies. */
+  def count: Long = (0 until BUCKETS).foldLeft(0L)((acc, i) => acc + counts.get(i))
+
+  /** Serialize the non-empty buckets, as a sequence of little-endian
+    * (uint32 bucket index, int64 count) pairs. */
+  def toBytes: Array[Byte] = {
+    val nonEmpty = (0 until BUCKETS).filter(counts.get(_) != 0)
+    val buf = ByteBuffer.allocate(nonEmpty.size * 12).order(ByteOrder.LITTLE_ENDIAN)
+    nonEmpty.foreach { i =>
+      buf.putInt(i)
+      buf.putLong(counts.get(i))
+    }
+    buf.array
+  }
+}
+
+object LatencyHistogram {
+  /** Bits of precision: each power of two is split into `2^(SUB_BITS-1)`
+    * buckets.  NOTE: after changing the bucket layout, regenerate the bucket
+    * check file (see [[main]]) */
+  val SUB_BITS = 7
+  val HALF = 1 << (SUB_BITS - 1)
+
+  /** Number of buckets, enough for any non-negative `Long`. */
+  val BUCKETS = (63 - (SUB_BITS - 1) + 1) * HALF
+
+  /** Index of the bucket containing the given non-negative value. */
+  def bucket(v: Long): Int = {
+    if (v < 2 * HALF) v.toInt else {
+      val shift = 63 - java.lang.Long.numberOfLeadingZeros(v) - (SUB_BITS - 1)
+      (shift + 1) * HALF + ((v >>> shift) - HALF).toInt
+    }
+  }
+
+  /** Values whose buckets are written to the bucket check file. */
+  val CHECK_VALUES = List(0L, 1L, 2L, 63L, 64L, 127L, 128L, 129L, 130L, 131L,
+                          255L, 256L, 257L, 1000L, 4095L, 4096L, 65535L,
+                          1000000L, 123456789L, (1L << 40) + 5L, 1L << 62,
+                          Long.MaxValue)
+
+  /** Default bucket check file, relative to the repository root. */
+  val CHECK_FILE = "scripts/latency_buckets.csv"
+
+  /** Write the bucket of each value in `CHECK_VALUES` to a CSV file (default:
+    * `CHECK_FILE`), with "sub_bucket_bits,value,bucket" rows.
+    * latency_cdf.py checks that it decodes each value into the same bucket.
+    *
+    * Usage: sbt "benchmarks/runMain effpi.benchmarks.LatencyHistogram"
+    */
+  def main(args: Array[String]): Unit = {
+    val path = Paths.get(args.headOption.getOrElse(CHECK_FILE))
+    val rows = CHECK_VALUES.map(v => s"${SUB_BITS},${v},${bucket(v)}")
+    Files.write(path, ("sub_bucket_bits,value,bucket" :: rows).asJava)
+  }
+
+  /** Check that the bucket check file (see [[main]]) matches the current
+    * bucket layout, i.e. that latency_cdf.py is checked against it. */
+  def checkBuckets(path: Path): Unit = {
+    Files.readAllLines(path).asScala.toList.tail.foreach { line =>
+      val Array(bits, v, b) = line.split(",").map(_.trim.toLong)
+      if (bits != SUB_BITS || bucket(v) != b) {
+        throw new RuntimeException(
+          s"${path}: ${v} is in bucket ${b} with ${bits} sub-bucket bits, " +
+          s"but in bucket ${bucket(v)} with ${SUB_BITS} sub-bucket bits: " +
+          "regenerate the file with LatencyHistogram.main, and check " +
+          "that latency_cdf.py still decodes it")
+      }
+    }
+  }
+
+  /** The histogram where the running benchmark records latencies, if any.
+    *
+    * Set by the benchmark driver (see [[effpi.benchmarks.main.Main]]) around
+    * each repetition; benchmarks supporting latency recording read it when
+    * they start.
+    */
+  @volatile var current: Option[LatencyHistogram] = None
+}
@@ -12,6 +12,7 @@ import effpi.actor.dsl._
 import effpi.process._
 import effpi.process.dsl.{Yielding, pyield, Loop, Rec, rec => prec, loop => ploop}
 import effpi.system._
+import effpi.benchmarks.LatencyHistogram
 
 object ForkJoinThroughput {
 
@@ -19,6 +20,10 @@ object ForkJoinThroughput {
 
   case class Message(msg: String)
 
+  // Message sent at time `sentAt`: only used when recording latencies, to
+  // leave the messages of normal benchmark runs unchanged
+  class TimedMessage(msg: String, val sentAt: Long) extends Message(msg)
+
   sealed abstract class RecAt2[A] extends RecVar[A]("InfiniteActorLoop")
   case object RecA2 extends RecAt2[Unit]
 
@@ -26,9 +31,14 @@ object ForkJoinThroughput {
 
   def simpleActor(maxMsgs: Int) = Behavior[Message, SimpleActor] {
     var count = 0
+    val latencies = LatencyHistogram.current // Record message latencies?
     prec(RecA) {
       if (count < maxMsgs) {
-        read { (_: Message) =>
+        read { (m: Message) =>
+          latencies.foreach { h => m match {
+            case t: TimedMessage => h.record(System.nanoTime() - t.sentAt)
+            case _ => ()
+          }}
           count += 1
           ploop(RecA)
         }
@@ -50,11 +60,14 @@ object ForkJoinThroughput {
 
     val simpleActorsRef = (1 to numActors).map{ _ => Actor.spawn(simpleActor(numMessages))}
 
+    val recordLatencies = LatencyHistogram.current.isDefined
     val startTime = System.nanoTime()
     (1 to numMessages).foreach { n =>
       // println(n)
       simpleActorsRef.foreach { simpleActor =>
-        simpleActor.send(Message("Hello World!"))
+        simpleActor.send(
+          if (recordLatencies) TimedMessage("Hello World!", System.nanoTime())
+          else Message("Hello World!"))
       }
     }
     val endTime = System.nanoTime()
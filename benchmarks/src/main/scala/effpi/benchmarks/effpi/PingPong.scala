@@ -12,6 +12,7 @@ import effpi.actor.dsl._
 import effpi.process._
 import effpi.process.dsl.{Yielding, pyield, Loop, Rec, rec => prec, loop => ploop}
 import effpi.system._
+import effpi.benchmarks.LatencyHistogram
 
 object PingPong {
   implicit val timeout: Duration = Duration.Inf
@@ -45,13 +46,17 @@ object PingPong {
 
   def ping(max: Int, pongRef: ActorRef[(Ping | Stop)])(startTimePromise: Promise[Long]) = Behavior[PongMessage, PingProcess[pongRef.type]] {
     var count = max
+    val latencies = LatencyHistogram.current // Record round-trips?
+    var sentAt = 0L
     startTimePromise.success(System.nanoTime())
     prec(RecA) {
       // println("ping...")
       if (count > 0) {
+        if (latencies.isDefined) sentAt = System.nanoTime()
         send(pongRef, Ping(self)) >>
         read { (x: PongMessage) => x match {
             case PongMessage.Pong =>
+              latencies.foreach(_.record(System.nanoTime() - sentAt))
               count = count - 1
               // println(s"count = $count")
               // println("finishing...")
@@ -13,6 +13,7 @@ import effpi.actor.dsl._
 import effpi.process._
 import effpi.process.dsl.{Yielding, pyield, Loop, Rec, rec => prec, loop => ploop}
 import effpi.system._
+import effpi.benchmarks.LatencyHistogram
 
 object Ring {
 
@@ -21,6 +22,22 @@ object Ring {
   enum Message {
     case Pass(msg: String, count: Int, endTimePromise: Promise[Long])
     case Stop(left: Int)
+    // Message sent at time `sentAt`: only used when recording hop latencies,
+    // to leave the messages of normal benchmark runs unchanged
+    case Timed(m: Message, sentAt: Long)
+  }
+
+  // Wrap `m` with its sending time, if hop latencies are recorded
+  private def timed(m: Message, latencies: Option[LatencyHistogram]): Message = {
+    if (latencies.isDefined) Message.Timed(m, System.nanoTime()) else m
+  }
+
+  // Unwrap a timed message, recording its latency
+  private def untimed(m: Message, latencies: Option[LatencyHistogram]): Message = m match {
+    case Message.Timed(inner, sentAt) =>
+      latencies.foreach(_.record(System.nanoTime() - sentAt))
+      inner
+    case _ => m
   }
 
   type RingInitialiser = PNil >>: Rec[RecAt, (SendTo[ActorRef[Message], Message] >>: Loop[RecAt] | RingMember)]
@@ -31,12 +48,13 @@ object Ring {
     (startTimePromise: Promise[Long], endTimePromise: Promise[Long]) = Behavior[Message, RingInitialiser] {
     nil >> {
       val ft = Await.result(forwardTo, Duration.Inf)
+      val latencies = LatencyHistogram.current
       startTimePromise.success(System.nanoTime())
       var currMsgs = 0
       prec(RecB) {
         if (currMsgs < numMsgs) {
           currMsgs += 1
-          send(ft, Message.Pass(msg, count - 1, endTimePromise)) >>
+          send(ft, timed(Message.Pass(msg, count - 1, endTimePromise), latencies)) >>
             ploop(RecB)
         } else {
           ringMember(members, numMsgs, ft)()
@@ -50,40 +68,43 @@ object Ring {
   def ringMember(members: Int, numMsgs: Int, forwardTo: ActorRef[Message]) = Behavior[Message, RingMember] {
     var msgFinished = 0
     var msgDone = 0
+    val latencies = LatencyHistogram.current // Record hop latencies?
     prec(RecA) {
-      read {
-        case Message.Pass(msg, count, endTimePromise) =>
-          if (count > 0) {
-            send(forwardTo, Message.Pass(msg, count - 1, endTimePromise)) >>
-              ploop(RecA)
-          } else {
-            msgFinished += 1
-            send(forwardTo, Message.Stop(members - 1)) >> {
-              if (msgFinished == numMsgs) {
-                endTimePromise.success(System.nanoTime())
-                nil
-              } else {
+      read { (m: Message) =>
+        (untimed(m, latencies): @unchecked) match {
+          case Message.Pass(msg, count, endTimePromise) =>
+            if (count > 0) {
+              send(forwardTo, timed(Message.Pass(msg, count - 1, endTimePromise), latencies)) >>
                 ploop(RecA)
+            } else {
+              msgFinished += 1
+              send(forwardTo, Message.Stop(members - 1)) >> {
+                if (msgFinished == numMsgs) {
+                  endTimePromise.success(System.nanoTime())
+                  nil
+                } else {
+                  ploop(RecA)
+                }
               }
             }
-          }
-        case Message.Stop(left) =>
-          msgDone += 1
-          if (left > 0) {
-            send(forwardTo, Message.Stop(left - 1)) >> {
-              if ( msgDone == numMsgs) {
+          case Message.Stop(left) =>
+            msgDone += 1
+            if (left > 0) {
+              send(forwardTo, Message.Stop(left - 1)) >> {
+                if ( msgDone == numMsgs) {
+                  nil
+                } else {
+                  ploop(RecA)
+                }
+              }
+            } else {
+              if (msgDone == numMsgs) {
                 nil
               } else {
                 ploop(RecA)
               }
             }
-          } else {
-            if (msgDone == numMsgs) {
-              nil
-            } else {
-              ploop(RecA)
-            }
-          }
+        }
       }
     }
   }
@@ -0,0 +1,109 @@
+// Effpi - verified message-passing programs in Dotty
+// Copyright 2019 Alceste Scalas and Elias Benussi
+// Released under the MIT License: https://opensource.org/licenses/MIT
+package effpi.benchmarks.main
+
+import java.lang.management.ManagementFactory
+import java.util.concurrent.ConcurrentLinkedQueue
+
+import scala.collection.mutable.ListBuffer
+import scala.jdk.CollectionConverters._
+
+import scalikejdbc._
+
+import effpi.system.{ProcessSystem, RuntimeStats}
+
+/** Periodic sampler of the scheduler and channel backlogs of the Effpi
+  * process systems, and of the GC activity, during a benchmark repetition.
+  *
+  * Requires [[RuntimeStats]] to be enabled.  Pending inputs and channels
+  * are counted from the start of the sampling, since the processes left
+  * waiting by previous repetitions are never resumed.
+  *
+  * The sampled process systems are registered with [[BacklogSampler.track]]
+  * while the sampler is [[BacklogSampler.current]].
+  *
+  * @param intervalMillis Sampling interval
+  */
+class BacklogSampler(intervalMillis: Long) {
+  import BacklogSampler._
+
+  private val systems = new ConcurrentLinkedQueue[ProcessSystem]()
+  private val gcBeans = ManagementFactory.getGarbageCollectorMXBeans.asScala.toList
+  private val samples = ListBuffer[Sample]()
+  private val pendingStart = RuntimeStats.pendingInputs.sum
+  private val channelsStart = RuntimeStats.inChannels.sum
+  private val start = System.nanoTime()
+  @volatile private var running = true
+
+  private val thread = new Thread(() => {
+    while (running) {
+      samples += sample()
+      try { Thread.sleep(intervalMillis) } catch {
+        case _: InterruptedException => ()
+      }
+    }
+  })
+  thread.setDaemon(true)
+  thread.start()
+
+  private def sample(): Sample = {
+    val ps = systems.asScala.toList
+    Sample(System.nanoTime() - start,
+           ps.map(_.runningQueue.backlog).sum,
+           ps.map(_.waitingQueue.backlog).sum,
+           RuntimeStats.pendingInputs.sum - pendingStart,
+           RuntimeStats.inChannels.sum - channelsStart,
+           gcBeans.map(_.getCollectionCount max 0L).sum,
+           gcBeans.map(_.getCollectionTime max 0L).sum)
+  }
+
+  /** Stop sampling, and return the samples (including a final one). */
+  def stop(): List[Sample] = {
+    running = false
+    thread.interrupt()
+    thread.join()
+    samples += sample()
+    systems.clear()
+    samples.toList
+  }
+}
+
+object BacklogSampler {
+  /** A backlog sample.
+    *
+    * @param elapsedNanos Time since the start of the sampling
+    * @param runningProcesses Processes in the running queues
+    * @param scheduledChannels Input channels in the waiting queues
+    * @param pendingInputs Input processes waiting on channels
+    * @param inChannels Input channels created
+    * @param gcCount Cumulative number of GC runs (all collectors)
+    * @param gcMillis Cumulative GC time (all collectors)
+    */
+  case class Sample(elapsedNanos: Long,
+                    runningProcesses: Long,
+                    scheduledChannels: Long,
+                    pendingInputs: Long,
+                    inChannels: Long,
+                    gcCount: Long,
+                    gcMillis: Long)
+
+  /** Sampler of the running benchmark repetition, if any. */
+  @volatile var current: Option[BacklogSampler] = None
+
+  /** Sample the backlogs of the given process system with the current
+    * sampler (if any). */
+  def track[PS <: ProcessSystem](ps: PS): PS = {
+    current.foreach(_.systems.add(ps))
+    ps
+  }
+
+  /** Store the given samples in the `benchmark_backlog` table. */
+  def record(benchId: Long, benchType: String, repetition: Int, samples: List[Sample])(implicit session: DBSession) = {
+    val params = samples.map { s =>
+      Seq(benchId, benchType, repetition, s.elapsedNanos, s.runningProcesses,
+          s.scheduledChannels, s.pendingInputs, s.inChannels, s.gcCount, s.gcMillis)
+    }
+    sql"insert into benchmark_backlog (`benchmark_id`, `benchmark_type`, `repetition`, `elapsed_nanoseconds`, `running_processes`, `scheduled_channels`, `pending_inputs`, `in_channels`, `gc_count`, `gc_millis`) values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)".batch(params: _*).apply()
+  }
+}
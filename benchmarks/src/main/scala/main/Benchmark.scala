@@ -19,9 +19,10 @@ import scala.language.implicitConversions
 import java.sql.DriverManager
 import scalikejdbc._//{ConnectionPool, AutoSession, sql}
 
-import effpi.system.{ProcessSystemStateMachineMultiStep,
-                     ProcessSystemRunnerImproved}
+import effpi.system.{ProcessSystem, ProcessSystemStateMachineMultiStep,
+                     ProcessSystemRunnerImproved, RuntimeStats}
 import effpi.benchmarks.{effpi => effpib, akka => akkab}
+import effpi.benchmarks.LatencyHistogram
 
 object Main {
   Class.forName("org.sqlite.JDBC") // Import SQLite JDBC driver
@@ -53,6 +54,20 @@ object Main {
   val RING = "ring"
   val RINGSTREAM = "ringstream"
 
+  // Record per-message latency histograms? (Only supported by some Effpi
+  // benchmarks: pingpong, ring, ringstream, forkjoin_throughput)
+  val RECORD_LATENCIES = sys.props.get("effpi.benchmarks.latency").contains("true")
+
+  // Size (i.e., first parameter) to record with JDK Flight Recorder, if any,
+  // and directory for the recordings (see runBenchmarks and jfr_summary.py)
+  val JFR_SIZE = sys.props.get("effpi.benchmarks.jfr.size").map(_.toInt)
+  val JFR_DIR = sys.props.getOrElse("effpi.benchmarks.jfr.dir", "jfr")
+  val JFR_SETTINGS = "profile" // JFR configuration used for the recordings
+
+  // Interval (in milliseconds) for sampling the scheduler and channel
+  // backlogs of Effpi benchmarks, if any (see BacklogSampler)
+  val BACKLOG_INTERVAL = sys.props.get("effpi.benchmarks.backlog").map(_.toLong)
+
   // System setups, as strings
   val EFFPI_STATEMACHINE = "statemachinemultistep"
   val EFFPI_RUNNER = "runnerimproved"
@@ -74,6 +89,16 @@ object Main {
 
     val benchGroupId = args(4).toInt
 
+    // Latency histograms are decoded by latency_cdf.py: refuse to record
+    // them if the bucket layout changed since its check file was written
+    if (RECORD_LATENCIES) {
+      LatencyHistogram.checkBuckets(java.nio.file.Paths.get(LatencyHistogram.CHECK_FILE))
+    }
+
+    // Backlog sampling needs runtime statistics, enabled before creating
+    // any process system
+    RuntimeStats.enabled = BACKLOG_INTERVAL.isDefined
+
     val startTime = ZonedDateTime.now()
     println(s"Benchmark starting: ${startTime.format(RFC)}")
 
@@ -97,6 +122,11 @@ object Main {
     println("Total time: %d:%02d:%02d".format(hh, mm, ss))
   }
 
+  // Track the CPU usage and backlogs of an Effpi process system
+  private def track[PS <: ProcessSystem](ps: PS): PS = {
+    BacklogSampler.track(CpuUsage.track(ps))
+  }
+
   // Representation of a benchmark
   case class BenchmarkFun[A](stateMachine: A => Long,
                              runner: A => Long,
@@ -112,8 +142,8 @@ object Main {
         sql"insert into benchmark_chameneos (`id`, `name`, `size`, `meetings`) values (${benchId}, ${CHAMENEOS}, ${p._1}, ${p._2})".update.apply()(session)
       },
       BenchmarkFun(
-        (param: (Int, Int)) => effpib.Chameneos.bench(param, () => ProcessSystemStateMachineMultiStep()),
-        (param: (Int, Int)) => effpib.Chameneos.bench(param, () => ProcessSystemRunnerImproved()),
+        (param: (Int, Int)) => effpib.Chameneos.bench(param, () => track(ProcessSystemStateMachineMultiStep())),
+        (param: (Int, Int)) => effpib.Chameneos.bench(param, () => track(ProcessSystemRunnerImproved())),
         (param: (Int, Int)) => akkab.Chameneos.bench(param)
       )
     ),
@@ -123,8 +153,8 @@ object Main {
         sql"insert into benchmark_counting (`id`, `name`, `count`) values (${benchId}, ${COUNTING}, ${p})".update.apply()(session)
       },
       BenchmarkFun(
-        (param: Int) => effpib.CountingActor.bench(param, () => ProcessSystemStateMachineMultiStep()),
-        (param: Int) => effpib.CountingActor.bench(param, () => ProcessSystemRunnerImproved()),
+        (param: Int) => effpib.CountingActor.bench(param, () => track(ProcessSystemStateMachineMultiStep())),
+        (param: Int) => effpib.CountingActor.bench(param, () => track(ProcessSystemRunnerImproved())),
         (param: Int) => akkab.CountingActor.bench(param)
       )
     ),
@@ -134,8 +164,8 @@ object Main {
         sql"insert into benchmark_forkjoin_creation (`id`, `name`, `size`) values (${benchId}, ${FORKJOIN_CREATION}, ${p})".update.apply()(session)
       },
       BenchmarkFun(
-        (param: Int) => effpib.ForkJoinCreation.bench(param, () => ProcessSystemStateMachineMultiStep()),
-        (param: Int) => effpib.ForkJoinCreation.bench(param, () => ProcessSystemRunnerImproved()),
+        (param: Int) => effpib.ForkJoinCreation.bench(param, () => track(ProcessSystemStateMachineMultiStep())),
+        (param: Int) => effpib.ForkJoinCreation.bench(param, () => track(ProcessSystemRunnerImproved())),
         (param: Int) => akkab.ForkJoinCreation.bench(param)
       )
     ),
@@ -145,8 +175,8 @@ object Main {
         sql"insert into benchmark_forkjoin_throughput (`id`, `name`, `size`, `messages`) values (${benchId}, ${FORKJOIN_THROUGHPUT}, ${p._1}, ${p._2})".update.apply()(session)
       },
       BenchmarkFun(
-        (param: (Int, Int)) => effpib.ForkJoinThroughput.bench(param, () => ProcessSystemStateMachineMultiStep()),
-        (param: (Int, Int)) => effpib.ForkJoinThroughput.bench(param, () => ProcessSystemRunnerImproved()),
+        (param: (Int, Int)) => effpib.ForkJoinThroughput.bench(param, () => track(ProcessSystemStateMachineMultiStep())),
+        (param: (Int, Int)) => effpib.ForkJoinThroughput.bench(param, () => track(ProcessSystemRunnerImproved())),
         (param: (Int, Int)) => akkab.ForkJoinThroughput.bench(param)
       )
     ),
@@ -156,8 +186,8 @@ object Main {
         sql"insert into benchmark_pingpong (`id`, `name`, `pairs`, `exchanges`) values (${benchId}, ${PINGPONG}, ${p._1}, ${p._2})".update.apply()(session)
       },
       BenchmarkFun(
-        (param: (Int, Int)) => effpib.PingPong.bench(param, () => ProcessSystemStateMachineMultiStep()),
-        (param: (Int, Int)) => effpib.PingPong.bench(param, () => ProcessSystemRunnerImproved()),
+        (param: (Int, Int)) => effpib.PingPong.bench(param, () => track(ProcessSystemStateMachineMultiStep())),
+        (param: (Int, Int)) => effpib.PingPong.bench(param, () => track(ProcessSystemRunnerImproved())),
         (param: (Int, Int)) => akkab.PingPong.bench(param)
       )
     ),
@@ -167,8 +197,8 @@ object Main {
         sql"insert into benchmark_ring (`id`, `name`, `size`, `hops`) values (${benchId}, ${RING}, ${p._1}, ${p._2})".update.apply()(session)
       },
       BenchmarkFun(
-        (param: (Int, Int, Int)) => effpib.Ring.bench(param, () => ProcessSystemStateMachineMultiStep()),
-        (param: (Int, Int, Int)) => effpib.Ring.bench(param, () => ProcessSystemRunnerImproved()),
+        (param: (Int, Int, Int)) => effpib.Ring.bench(param, () => track(ProcessSystemStateMachineMultiStep())),
+        (param: (Int, Int, Int)) => effpib.Ring.bench(param, () => track(ProcessSystemRunnerImproved())),
         (param: (Int, Int, Int)) => akkab.Ring.bench(param)
       )
     ),
@@ -180,8 +210,8 @@ object Main {
         sql"insert into benchmark_ringstream (`id`, `name`, `size`, `hops`, `messages`) values (${benchId}, ${RINGSTREAM}, ${p._1}, ${p._2}, ${p._3})".update.apply()(session)
       },
       BenchmarkFun(
-        (param: (Int, Int, Int)) => effpib.Ring.bench(param, () => ProcessSystemStateMachineMultiStep()),
-        (param: (Int, Int, Int)) => effpib.Ring.bench(param, () => ProcessSystemRunnerImproved()),
+        (param: (Int, Int, Int)) => effpib.Ring.bench(param, () => track(ProcessSystemStateMachineMultiStep())),
+        (param: (Int, Int, Int)) => effpib.Ring.bench(param, () => track(ProcessSystemRunnerImproved())),
         (param: (Int, Int, Int)) => akkab.Ring.bench(param)
       )
     )
@@ -203,23 +233,66 @@ object Main {
       params.foreach { p =>
         val benchId = sql"insert into benchmark(`group`, `type`, `name`, `system`, `start`) values (${benchGroupId}, ${BENCH_SIZE_TIME}, ${benchName}, ${system}, ${System.currentTimeMillis})".updateAndReturnGeneratedKey.apply()
         benchmark.sqlInsert(benchId, p, session)
+        Environment.record(benchId, Environment.BEFORE)
+        val recording = if (JFR_SIZE.contains(paramSize(p))) Some(startRecording()) else None
         (1 to repetitions).foreach { r =>
           System.gc()
-          val nanosecs = system match {
-            case EFFPI_STATEMACHINE => benchmark.fun.stateMachine(p)
-            case EFFPI_RUNNER => benchmark.fun.runner(p)
-            case AKKA => benchmark.fun.akka(p)
-            case unsupported => {
-              throw new RuntimeException(s"Unsupported system: ${unsupported}")
+          val latencies = if (RECORD_LATENCIES) Some(new LatencyHistogram()) else None
+          LatencyHistogram.current = latencies
+          val sampler = BACKLOG_INTERVAL.map(new BacklogSampler(_))
+          BacklogSampler.current = sampler
+          val (nanosecs, cpu) = CpuUsage.measure {
+            system match {
+              case EFFPI_STATEMACHINE => benchmark.fun.stateMachine(p)
+              case EFFPI_RUNNER => benchmark.fun.runner(p)
+              case AKKA => benchmark.fun.akka(p)
+              case unsupported => {
+                throw new RuntimeException(s"Unsupported system: ${unsupported}")
+              }
             }
           }
+          BacklogSampler.current = None
+          val backlog = sampler.map(_.stop())
+          LatencyHistogram.current = None
           sql"insert into benchmark_duration (`benchmark_id`, `benchmark_type`, `repetition`, `nanoseconds`) values (${benchId}, ${BENCH_SIZE_TIME}, ${r}, ${nanosecs})".update.apply()
+          CpuUsage.record(benchId, BENCH_SIZE_TIME, r, cpu)
+          backlog.foreach(BacklogSampler.record(benchId, BENCH_SIZE_TIME, r, _))
+          // Benchmarks without latency support leave the histogram empty
+          latencies.filter(_.count > 0).foreach { h =>
+            sql"insert into benchmark_latency (`benchmark_id`, `benchmark_type`, `repetition`, `sub_bucket_bits`, `count`, `histogram`) values (${benchId}, ${BENCH_SIZE_TIME}, ${r}, ${LatencyHistogram.SUB_BITS}, ${h.count}, ${h.toBytes})".update.apply()
+          }
         }
+        recording.foreach(stopRecording(benchId, _))
+        Environment.record(benchId, Environment.AFTER)
         sql"update benchmark set `end` = ${System.currentTimeMillis} where `id` = ${benchId}".update.apply()
       }
     }
   }
 
+  // The "size" of benchmark parameters, i.e., their first element
+  def paramSize(p: Any): Int = p match {
+    case t: Product => t.productElement(0).asInstanceOf[Int]
+    case n: Int => n
+  }
+
+  def startRecording(): jdk.jfr.Recording = {
+    val recording = new jdk.jfr.Recording(jdk.jfr.Configuration.getConfiguration(JFR_SETTINGS))
+    recording.start()
+    recording
+  }
+
+  // Stop the recording, save it in JFR_DIR, and link it to the benchmark
+  def stopRecording(benchId: Long, recording: jdk.jfr.Recording)(implicit session: DBSession) = {
+    import java.nio.file.{Files, Paths}
+    recording.stop()
+    val path = Paths.get(JFR_DIR, s"benchmark-${benchId}.jfr")
+    Files.createDirectories(path.getParent)
+    recording.dump(path)
+    println(s"Flight recording saved: ${path}")
+    sql"insert into benchmark_jfr (`benchmark_id`, `path`, `settings`, `start`, `end`) values (${benchId}, ${path.toString}, ${JFR_SETTINGS}, ${recording.getStartTime.toEpochMilli}, ${recording.getStopTime.toEpochMilli})".update.apply()
+    recording.close()
+  }
+
   def benchSizeVsMemory(benchGroupId: Long,
                         benchName: String, system: String,
                         db: DB,
@@ -283,6 +356,7 @@ object Main {
       // Memory used before the benchmark
       // val initMem = Runtime.getRuntime.totalMemory-Runtime.getRuntime.freeMemory
 
+      Environment.record(benchId, Environment.BEFORE)
       System.gc()
       attachGCListener()
       system match {
@@ -299,6 +373,7 @@ object Main {
       // val actualMemUsage = (finalMem - initMem) max 0
 
       detachGCListener()
+      Environment.record(benchId, Environment.AFTER)
       usedMem.foreach { (gc, memUsages) =>
         val gcCalls = memUsages.size
         // If the GC was never invoked, don't save any information
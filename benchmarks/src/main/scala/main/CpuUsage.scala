@@ -0,0 +1,100 @@
+// Effpi - verified message-passing programs in Dotty
+// Copyright 2019 Alceste Scalas and Elias Benussi
+// Released under the MIT License: https://opensource.org/licenses/MIT
+package effpi.benchmarks.main
+
+import java.lang.management.ManagementFactory
+import java.nio.{ByteBuffer, ByteOrder}
+import java.util.concurrent.ConcurrentLinkedQueue
+
+import scala.jdk.CollectionConverters._
+
+import scalikejdbc._
+
+import effpi.system.ProcessSystem
+
+/** CPU usage of a benchmark repetition, next to its wall-clock time.
+  *
+  * The process CPU time covers all JVM threads (including GC and JIT
+  * threads).  The per-thread CPU times only cover the executor threads of
+  * the Effpi process systems created with [[track]] during the measurement;
+  * they are not available for Akka.
+  */
+object CpuUsage {
+  /** CPU usage measured by [[measure]].
+    *
+    * @param wallNanos Elapsed time
+    * @param processCpuNanos CPU time of the whole JVM process
+    * @param peakThreads Peak number of live JVM threads
+    * @param poolThreads Number of threads of the tracked process systems
+    * @param threadCpuNanos CPU time of each thread of the tracked process
+    *                       systems
+    */
+  case class Sample(wallNanos: Long,
+                    processCpuNanos: Option[Long],
+                    peakThreads: Int,
+                    poolThreads: Option[Int],
+                    threadCpuNanos: List[Long])
+
+  // Process systems created during the current measurement (if any).  They
+  // are only referenced while measuring, so that killed systems (and their
+  // queues) can be garbage-collected, e.g. during memory benchmarks
+  private val systems = new ConcurrentLinkedQueue[ProcessSystem]()
+  @volatile private var measuring = false
+
+  /** Track the CPU usage of the threads of the given process system, if
+    * called during [[measure]] (otherwise, do nothing). */
+  def track[PS <: ProcessSystem](ps: PS): PS = {
+    if (measuring) systems.add(ps)
+    ps
+  }
+
+  /** Run `body`, and return its result with its CPU usage.
+    *
+    * NOTE: the per-thread CPU times are recorded when the threads terminate,
+    * so `body` must kill the process systems it creates.
+    */
+  def measure[A](body: => A): (A, Sample) = {
+    val threadBean = ManagementFactory.getThreadMXBean
+    systems.clear()
+    measuring = true
+    try {
+      threadBean.resetPeakThreadCount()
+      val cpuStart = processCpuNanos()
+      val start = System.nanoTime()
+
+      val res = body
+
+      val wall = System.nanoTime() - start
+      val cpuEnd = processCpuNanos()
+      val pools = systems.asScala.toList
+
+      (res, Sample(wall,
+                   for (s <- cpuStart; e <- cpuEnd) yield e - s,
+                   threadBean.getPeakThreadCount,
+                   if (pools.isEmpty) None else Some(pools.map(_.threads.size).sum),
+                   pools.flatMap(_.threadCpuTimes.asScala)))
+    } finally {
+      measuring = false
+      systems.clear()
+    }
+  }
+
+  /** Store the given sample in the `benchmark_cpu` table. */
+  def record(benchId: Long, benchType: String, repetition: Int, s: Sample)(implicit session: DBSession) = {
+    val threadCpu = s.poolThreads.map { _ =>
+      val buf = ByteBuffer.allocate(8 * s.threadCpuNanos.size).order(ByteOrder.LITTLE_ENDIAN)
+      s.threadCpuNanos.foreach(buf.putLong(_))
+      buf.array
+    }
+    sql"insert into benchmark_cpu (`benchmark_id`, `benchmark_type`, `repetition`, `cores`, `wall_nanoseconds`, `process_cpu_nanoseconds`, `peak_threads`, `pool_threads`, `thread_cpu_nanoseconds`) values (${benchId}, ${benchType}, ${repetition}, ${Runtime.getRuntime.availableProcessors}, ${s.wallNanos}, ${s.processCpuNanos}, ${s.peakThreads}, ${s.poolThreads}, ${threadCpu})".update.apply()
+  }
+
+  private def processCpuNanos(): Option[Long] = {
+    ManagementFactory.getOperatingSystemMXBean match {
+      case b: com.sun.management.OperatingSystemMXBean =>
+        Some(b.getProcessCpuTime).filter(_ >= 0) // -1 if not supported
+      case _ => None
+    }
+  }
+}
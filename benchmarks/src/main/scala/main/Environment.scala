@@ -0,0 +1,111 @@
+// Effpi - verified message-passing programs in Dotty
+// Copyright 2019 Alceste Scalas and Elias Benussi
+// Released under the MIT License: https://opensource.org/licenses/MIT
+package effpi.benchmarks.main
+
+import java.nio.file.{Files, Path, Paths}
+
+import scala.jdk.CollectionConverters._
+import scala.util.Try
+
+import scalikejdbc._
+
+/** Machine-noise telemetry, sampled before and after each benchmark.
+  *
+  * All values are read from `/proc` (and `/sys`, for the CPU frequency
+  * governor); each value is `None` if it cannot be read (e.g., when not
+  * running on Linux).
+  */
+object Environment {
+  // Phases in which the environment is sampled
+  val BEFORE = "before"
+  val AFTER = "after"
+
+  /** A sample of the machine status.
+    *
+    * @param loadavg 1-minute load average
+    * @param cpuMHz Average current frequency of all CPUs
+    * @param governor CPU frequency scaling governor (of the first CPU)
+    * @param stealTicks Cumulative CPU steal time, in USER_HZ ticks
+    * @param idleTicks Cumulative CPU idle time (including I/O wait), in
+    *                  USER_HZ ticks
+    * @param totalTicks Cumulative CPU time (user to steal), in USER_HZ ticks
+    * @param processTicks Cumulative CPU time of this JVM process (user and
+    *                     system), in USER_HZ ticks
+    * @param memFreeBytes Memory available for starting new applications
+    */
+  case class Sample(loadavg: Option[Double],
+                    cpuMHz: Option[Double],
+                    governor: Option[String],
+                    stealTicks: Option[Long],
+                    idleTicks: Option[Long],
+                    totalTicks: Option[Long],
+                    processTicks: Option[Long],
+                    memFreeBytes: Option[Long])
+
+  def sample(): Sample = {
+    val (steal, idle, total) = cpuTicks() match {
+      case Some((s, i, t)) => (Some(s), Some(i), Some(t))
+      case None => (None, None, None)
+    }
+    Sample(loadavg(), cpuMHz(), governor(), steal, idle, total,
+           processTicks(), memFreeBytes())
+  }
+
+  /** Sample the environment, and store it in the `benchmark_environment`
+    * table for the given benchmark id and phase. */
+  def record(benchId: Long, phase: String)(implicit session: DBSession) = {
+    val s = sample()
+    sql"insert into benchmark_environment (`benchmark_id`, `phase`, `timestamp`, `cpus`, `loadavg`, `cpu_mhz`, `governor`, `steal_ticks`, `idle_ticks`, `total_ticks`, `process_ticks`, `mem_free_bytes`) values (${benchId}, ${phase}, ${System.currentTimeMillis}, ${Runtime.getRuntime.availableProcessors}, ${s.loadavg}, ${s.cpuMHz}, ${s.governor}, ${s.stealTicks}, ${s.idleTicks}, ${s.totalTicks}, ${s.processTicks}, ${s.memFreeBytes})".update.apply()
+  }
+
+  private def readLines(path: String): Option[List[String]] = Try {
+    Files.readAllLines(Paths.get(path)).asScala.toList
+  }.toOption
+
+  // /proc/loadavg: "0.42 0.35 0.30 1/234 5678"
+  private def loadavg(): Option[Double] = for {
+    lines <- readLines("/proc/loadavg")
+    line <- lines.headOption
+    v <- Try(line.split(" ")(0).toDouble).toOption
+  } yield v
+
+  // /proc/cpuinfo: one "cpu MHz : 1234.567" line per CPU
+  private def cpuMHz(): Option[Double] = readLines("/proc/cpuinfo").flatMap { lines =>
+    val mhz = lines.filter(_.startsWith("cpu MHz")).flatMap { l =>
+      Try(l.split(":")(1).trim.toDouble).toOption
+    }
+    if (mhz.isEmpty) None else Some(mhz.sum / mhz.size)
+  }
+
+  private def governor(): Option[String] = for {
+    lines <- readLines("/sys/devices/system/cpu/cpu0/cpufreq/scaling_governor")
+    line <- lines.headOption
+  } yield line.trim
+
+  // /proc/stat: "cpu  user nice system idle iowait irq softirq steal ..."
+  private def cpuTicks(): Option[(Long, Long, Long)] = for {
+    lines <- readLines("/proc/stat")
+    line <- lines.find(_.startsWith("cpu "))
+    ticks <- Try(line.split(" +").tail.map(_.toLong)).toOption
+    if ticks.length > 7
+  } yield (ticks(7), ticks(3) + ticks(4), ticks.take(8).sum) // Guest time is already in user time
+
+  // /proc/self/stat: "pid (comm) state ...", with utime and stime as the
+  // 14th and 15th fields
+  private def processTicks(): Option[Long] = for {
+    lines <- readLines("/proc/self/stat")
+    line <- lines.headOption
+    ticks <- Try {
+      val fields = line.substring(line.lastIndexOf(')') + 2).split(" ")
+      fields(11).toLong + fields(12).toLong
+    }.toOption
+  } yield ticks
+
+  // /proc/meminfo: "MemAvailable:   12345678 kB"
+  private def memFreeBytes(): Option[Long] = for {
+    lines <- readLines("/proc/meminfo")
+    line <- lines.find(_.startsWith("MemAvailable:"))
+    kb <- Try(line.split(" +")(1).toLong).toOption
+  } yield kb * 1024
+}
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# Effpi - verified message-passing programs in Dotty
+# Copyright 2019 Alceste Scalas and Elias Benussi
+# Released under the MIT License: https://opensource.org/licenses/MIT
+
+# Archive mode for benchmarks.db: pack the `benchmark_duration` rows of old
+# (completed) benchmark groups into `benchmark_duration_packed`, with one
+# BLOB of little-endian int64 nanoseconds per benchmark.
+#
+# Usage:
+#   python3 archive_durations.py pack [--group GID ...] [--keep-latest N] [--vacuum]
+#   python3 archive_durations.py unpack [--group GID ...] [--vacuum]
+#   python3 archive_durations.py vacuum
+import argparse
+import os
+import sqlite3
+import numpy as np
+
+SQLITE_FILE = '../benchmarks.db'
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'benchmarks.sql')
+
+# On-disk format of packed durations: little-endian int64 nanoseconds
+PACKED_DTYPE = np.dtype('<i8')
+
+
+def pack_durations(nanoseconds):
+    return np.asarray(nanoseconds, dtype=PACKED_DTYPE).tobytes()
+
+
+def unpack_durations(blob):
+    # NOTE: zero-copy, read-only view on the BLOB contents
+    return np.frombuffer(blob, dtype=PACKED_DTYPE)
+
+
+def fetch_raw_durations(c, bench_id, packed=True):
+    """Return the durations of all the repetitions of the given benchmark,
+    as stored in the DB: either a list of nanoseconds (one per row), or a
+    packed BLOB.  Use `packed=False` on DBs without the
+    `benchmark_duration_packed` table.  See `decode_durations`."""
+    rows = c.execute("SELECT `nanoseconds` FROM benchmark_duration "
+                     "WHERE `benchmark_id` = ? "
+                     "ORDER BY `repetition`", (bench_id,)).fetchall()
+    if rows or not packed:
+        return [r[0] for r in rows]
+    blob = c.execute("SELECT `nanoseconds` FROM benchmark_duration_packed "
+                     "WHERE `benchmark_id` = ?", (bench_id,)).fetchone()
+    return [] if blob is None else blob[0]
+
+
+def decode_durations(raw):
+    """Return the result of `fetch_raw_durations` as an array of
+    nanoseconds."""
+    if isinstance(raw, bytes):
+        return unpack_durations(raw)
+    return np.fromiter(raw, dtype=PACKED_DTYPE, count=len(raw))
+
+
+def fetch_durations(c, bench_id, packed=True):
+    """Return the durations (in nanoseconds) of all the repetitions of the
+    given benchmark, reading either packed or unpacked rows."""
+    return decode_durations(fetch_raw_durations(c, bench_id, packed))
+
+
+def has_packed_table(c):
+    c.execute("SELECT 1 FROM sqlite_master "
+              "WHERE `type` = 'table' AND `name` = 'benchmark_duration_packed'")
+    return c.fetchone() is not None
+
+
+def select_groups(c, gids, keep_latest):
+    if gids:
+        return list(gids)
+    # Only completed groups, skipping the most recent ones (used for plots)
+    c.execute("SELECT `id` FROM benchmark_group "
+              "WHERE `end` IS NOT NULL "
+              "ORDER BY `end` DESC LIMIT -1 OFFSET ?", (keep_latest,))
+    return [r[0] for r in c.fetchall()]
+
+
+def pack(conn, gids, keep_latest):
+    c = conn.cursor()
+    groups = select_groups(c, gids, keep_latest)
+    packed_rows = []
+    skipped = 0
+    for gid in groups:
+        c.execute("SELECT `id` FROM benchmark "
+                  "WHERE `group` = ? AND `type` = 'size_vs_time' "
+                  "AND `end` IS NOT NULL", (gid,))
+        for (bid,) in c.fetchall():
+            reps = c.execute("SELECT `repetition`, `nanoseconds` "
+                             "FROM benchmark_duration "
+                             "WHERE `benchmark_id` = ? "
+                             "ORDER BY `repetition`", (bid,)).fetchall()
+            if not reps:
+                continue
+            # The BLOB only keeps the repetition order: refuse to pack
+            # benchmarks whose repetitions are not numbered 1..n
+            if [r[0] for r in reps] != list(range(1, len(reps) + 1)):
+                print('Skipping benchmark {}: non-contiguous repetitions'.format(bid))
+                skipped += 1
+                continue
+            # NULL durations (e.g. failed repetitions) cannot be packed
+            if any(r[1] is None for r in reps):
+                print('Skipping benchmark {}: missing durations'.format(bid))
+                skipped += 1
+                continue
+            packed_rows.append((bid, 'size_vs_time', len(reps),
+                                pack_durations([r[1] for r in reps])))
+
+    with conn:
+        c.executemany("INSERT INTO benchmark_duration_packed "
+                      "(`benchmark_id`, `benchmark_type`, `repetitions`, `nanoseconds`) "
+                      "VALUES (?, ?, ?, ?)", packed_rows)
+        c.executemany("DELETE FROM benchmark_duration WHERE `benchmark_id` = ?",
+                      [(r[0],) for r in packed_rows])
+    print('Packed {} benchmarks from {} groups ({} skipped)'.format(
+        len(packed_rows), len(groups), skipped))
+
+
+def unpack(conn, gids):
+    c = conn.cursor()
+    if gids:
+        c.execute("SELECT p.`benchmark_id`, p.`nanoseconds` "
+                  "FROM benchmark_duration_packed AS p "
+                  "INNER JOIN benchmark ON (benchmark.`id` = p.`benchmark_id`) "
+                  "WHERE benchmark.`group` IN (%s)" % ','.join('?' * len(gids)),
+                  list(gids))
+    else:
+        c.execute("SELECT `benchmark_id`, `nanoseconds` "
+                  "FROM benchmark_duration_packed")
+    packed = c.fetchall()
+
+    rows = [(bid, 'size_vs_time', rep, int(ns))
+            for bid, blob in packed
+            for rep, ns in enumerate(unpack_durations(blob), start=1)]
+
+    with conn:
+        c.executemany("INSERT INTO benchmark_duration "
+                      "(`benchmark_id`, `benchmark_type`, `repetition`, `nanoseconds`) "
+                      "VALUES (?, ?, ?, ?)", rows)
+        c.executemany("DELETE FROM benchmark_duration_packed "
+                      "WHERE `benchmark_id` = ?", [(p[0],) for p in packed])
+    print('Unpacked {} benchmarks ({} repetitions)'.format(len(packed), len(rows)))
+
+
+def vacuum(conn):
+    before = os.path.getsize(SQLITE_FILE)
+    conn.execute("VACUUM")
+    after = os.path.getsize(SQLITE_FILE)
+    print('Vacuum: {} -> {} bytes'.format(before, after))
+
+
+def main():
+    global SQLITE_FILE
+
+    parser = argparse.ArgumentParser(
+        description='Pack/unpack the benchmark durations of old groups')
+    parser.add_argument('--db', default=SQLITE_FILE,
+                        help='SQLite DB file (default: %(default)s)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_pack = sub.add_parser('pack', help='Pack durations into BLOBs')
+    p_pack.add_argument('--group', type=int, action='append', default=[],
+                        help='Benchmark group to pack (can be repeated)')
+    p_pack.add_argument('--keep-latest', type=int, default=1,
+                        help='Without --group: number of most recent '
+                        'completed groups left unpacked (default: %(default)s)')
+    p_pack.add_argument('--vacuum', action='store_true',
+                        help='Vacuum the DB after packing')
+
+    p_unpack = sub.add_parser('unpack', help='Restore one row per repetition')
+    p_unpack.add_argument('--group', type=int, action='append', default=[],
+                          help='Benchmark group to unpack (default: all)')
+    p_unpack.add_argument('--vacuum', action='store_true',
+                          help='Vacuum the DB after unpacking')
+
+    sub.add_parser('vacuum', help='Reclaim unused space in the DB file')
+
+    args = parser.parse_args()
+    SQLITE_FILE = args.db
+
+    conn = sqlite3.connect(SQLITE_FILE)
+    try:
+        conn.execute("PRAGMA foreign_keys = ON")
+        # Create `benchmark_duration_packed` if the DB predates it
+        with open(SCHEMA_FILE) as f:
+            conn.executescript(f.read())
+
+        if args.command == 'pack':
+            pack(conn, args.group, args.keep_latest)
+        elif args.command == 'unpack':
+            unpack(conn, args.group)
+        if args.command == 'vacuum' or args.vacuum:
+            vacuum(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
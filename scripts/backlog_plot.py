@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# Effpi - verified message-passing programs in Dotty
+# Copyright 2019 Alceste Scalas and Elias Benussi
+# Released under the MIT License: https://opensource.org/licenses/MIT
+
+# Scheduler and channel backlogs over time, from the `benchmark_backlog`
+# table, aligned with GC events.
+#
+# The backlogs are sampled when running the benchmarks with
+# BENCH_JAVA_OPTS="-Deffpi.benchmarks.backlog=<millisecs>" (see
+# runBenchmarks).  For each benchmark and Effpi system, one plot per size
+# shows the running queue, the scheduled input channels and the pending
+# inputs against elapsed time, with shaded intervals containing GC runs.
+# A summary per size is also printed (as CSV).
+#
+# Usage:
+#   python3 backlog_plot.py [--db FILE] [--group GID] [--repetition R]
+import argparse
+import os
+import sqlite3
+import numpy as np
+import matplotlib.pyplot as plt
+
+from benchmark_db import SIZE_FIELDS, latest_group, group_filter
+
+SQLITE_FILE = '../benchmarks.db'
+BACKLOG_PLOTS_PATH = './graphs/backlog/'
+
+SYSTEMS = ['statemachinemultistep', 'runnerimproved']
+
+# Plotted backlogs: (DB field, label)
+BACKLOGS = [
+    ('running_processes', 'Running queue'),
+    ('scheduled_channels', 'Scheduled channels'),
+    ('pending_inputs', 'Pending inputs'),
+]
+
+FIELDS = (['elapsed_nanoseconds'] + [f for f, _l in BACKLOGS] +
+          ['in_channels', 'gc_count', 'gc_millis'])
+
+
+def fetch_backlog(c, gid, bench_name, system, repetition):
+    """Return a list of (size, map from field to array of samples), sorted
+    by size."""
+    group, group_params = group_filter(gid)
+    c.execute("SELECT b.`%(s)s` AS `size`, %(f)s "
+              "FROM benchmark "
+              "INNER JOIN benchmark_%(b)s AS b ON (benchmark.`id` = b.`id`) "
+              "INNER JOIN benchmark_backlog AS l "
+              "ON (benchmark.`id` = l.`benchmark_id`) "
+              "WHERE %(g)s AND benchmark.`name` = ? "
+              "AND benchmark.`system` = ? AND l.`repetition` = ? "
+              "ORDER BY `size`, l.`elapsed_nanoseconds`" % {
+                  'b': bench_name, 's': SIZE_FIELDS[bench_name],
+                  'f': ', '.join('l.`%s`' % f for f in FIELDS),
+                  'g': group},
+              group_params + (bench_name, system, repetition))
+    rows = {}
+    for r in c.fetchall():
+        rows.setdefault(r[0], []).append(r[1:])
+    return [(size, dict(zip(FIELDS, np.array(rs, dtype=np.int64).T)))
+            for size, rs in sorted(rows.items())]
+
+
+def gc_intervals(samples):
+    """Return the (start, end) elapsed milliseconds of the sampling
+    intervals where the GC ran."""
+    t = samples['elapsed_nanoseconds'] / 1e6
+    runs = np.nonzero(np.diff(samples['gc_count']) > 0)[0]
+    return [(t[i], t[i + 1]) for i in runs]
+
+
+def backlog_summary(samples):
+    """Return (samples, fraction of samples with a non-empty running queue,
+    peak of each backlog, GC runs, GC millisecs)."""
+    running = samples['running_processes']
+    return ((len(running), np.mean(running > 0)) +
+            tuple(samples[f].max() for f, _l in BACKLOGS) +
+            (samples['gc_count'][-1] - samples['gc_count'][0],
+             samples['gc_millis'][-1] - samples['gc_millis'][0]))
+
+
+def plot_backlog(bench_name, system, backlogs):
+    f, axes = plt.subplots(len(backlogs), 1, squeeze=False,
+                           figsize=(8, 2.5 * len(backlogs)))
+    for ax, (size, samples) in zip(axes[:, 0], backlogs):
+        t = samples['elapsed_nanoseconds'] / 1e6
+        for field, label in BACKLOGS:
+            ax.plot(t, samples[field], label=label)
+        for start, end in gc_intervals(samples):
+            ax.axvspan(start, end, color='grey', alpha=0.3, lw=0)
+        ax.set_title('{} = {}'.format(SIZE_FIELDS[bench_name], size),
+                     fontsize='small')
+        ax.set_ylabel('Backlog')
+
+        # Channel creation, on a separate scale
+        ax2 = ax.twinx()
+        ax2.plot(t, samples['in_channels'], 'k:', label='Input channels')
+        ax2.set_ylabel('Channels', fontsize='small')
+
+    axes[0, 0].legend(fontsize='small', loc='upper left')
+    axes[-1, 0].set_xlabel('Elapsed time (ms); shaded: GC runs')
+    f.tight_layout()
+    f.savefig('{}{}_{}.pdf'.format(BACKLOG_PLOTS_PATH, bench_name, system),
+              bbox_inches='tight')
+    plt.close(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Plot scheduler and channel backlogs over time')
+    parser.add_argument('--db', default=SQLITE_FILE,
+                        help='SQLite DB file (default: %(default)s)')
+    parser.add_argument('--group', type=int,
+                        help='Benchmark group (default: latest completed)')
+    parser.add_argument('--repetition', type=int, default=1,
+                        help='Repetition to plot (default: %(default)s)')
+    args = parser.parse_args()
+
+    os.makedirs(BACKLOG_PLOTS_PATH, exist_ok=True)
+    with sqlite3.connect('file:{}?mode=ro'.format(args.db), uri=True) as conn:
+        c = conn.cursor()
+        gid = args.group if args.group is not None else latest_group(c)
+
+        print('benchmark,system,size,samples,backlogged_fraction,' +
+              ','.join('max_' + f for f, _l in BACKLOGS) + ',gc_runs,gc_ms')
+        for bn in SIZE_FIELDS:
+            for system in SYSTEMS:
+                backlogs = fetch_backlog(c, gid, bn, system, args.repetition)
+                if not backlogs:
+                    continue
+                for size, samples in backlogs:
+                    s = backlog_summary(samples)
+                    print('{},{},{},{},{:.3f},'.format(bn, system, size, *s[:2]) +
+                          ','.join(str(v) for v in s[2:]))
+                plot_backlog(bn, system, backlogs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# Effpi - verified message-passing programs in Dotty
+# Copyright 2019 Alceste Scalas and Elias Benussi
+# Released under the MIT License: https://opensource.org/licenses/MIT
+
+# Benchmark tables and groups of benchmarks.db, shared by the analysis
+# scripts (see benchmarks.sql).
+
+# Parameter fields of each benchmark table; the first one is the "size",
+# i.e. the x-axis of the plots
+PARAM_FIELDS = {
+    'chameneos' : ['size', 'meetings'],
+    'counting' : ['count'],
+    'forkjoin_creation' : ['size'],
+    'forkjoin_throughput' : ['size', 'messages'],
+    'pingpong' : ['pairs', 'exchanges'],
+    'ring' : ['size', 'hops'],
+    'ringstream' : ['size', 'hops', 'messages'],
+}
+
+# Which DB field is the "size" of each benchmark?
+SIZE_FIELDS = {b: fields[0] for b, fields in PARAM_FIELDS.items()}
+
+
+def sizes_subquery():
+    """Return a subquery selecting the `id` and `size` of all benchmarks."""
+    return ' UNION ALL '.join(
+        "SELECT `id`, `%s` AS `size` FROM benchmark_%s" % (f, b)
+        for b, f in SIZE_FIELDS.items())
+
+
+# Description of the groups re-running some cells (i.e. benchmark and
+# system) of an earlier group, followed by the cells (see runBenchmarks)
+RERUN_PREFIX = 'Re-run of'
+RERUN_DESCRIPTION = RERUN_PREFIX + ' group {}: '
+
+
+def latest_group(c):
+    """Return the id of the latest completed benchmark group, not counting
+    the groups re-running cells of earlier ones (see group_filter)."""
+    c.execute("SELECT `id` FROM benchmark_group "
+              "WHERE `end` IS NOT NULL "
+              "AND COALESCE(`description`, '') NOT LIKE ? "
+              "ORDER BY `end` DESC LIMIT 1",
+              (RERUN_PREFIX + '%',))
+    return c.fetchone()[0]
+
+
+def group_filter(gid):
+    """Return an SQL condition on `benchmark` selecting the benchmarks of the
+    given group, and its parameters.  The cells re-run by later completed
+    groups are taken from their latest re-run, instead of the given group."""
+    rerun = RERUN_DESCRIPTION.format(gid) + '%'
+    groups = ("SELECT `id` FROM benchmark_group WHERE `id` = ? "
+              "OR (`end` IS NOT NULL AND `description` LIKE ?)")
+    return ("benchmark.`group` IN (%(g)s) AND benchmark.`group` = ("
+            "SELECT r.`group` FROM benchmark AS r "
+            "INNER JOIN benchmark_group AS rg ON (r.`group` = rg.`id`) "
+            "WHERE r.`group` IN (%(g)s) "
+            "AND r.`name` = benchmark.`name` "
+            "AND r.`system` = benchmark.`system` "
+            "AND r.`type` = benchmark.`type` "
+            "ORDER BY rg.`id` = ?, rg.`end` DESC LIMIT 1)" % {'g': groups},
+            (gid, rerun, gid, rerun, gid))
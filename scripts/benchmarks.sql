@@ -166,3 +166,151 @@ CREATE TABLE IF NOT EXISTS benchmark_memory (
       ON UPDATE CASCADE ON DELETE RESTRICT,
   CHECK(`benchmark_type` == 'size_vs_memory')
 );
+
+-- Archived `benchmark_duration` rows: all the repetitions of a completed
+-- benchmark, packed into a single BLOB of little-endian int64 nanoseconds
+-- (ordered by repetition, starting from 1).  See archive_durations.py
+CREATE TABLE IF NOT EXISTS benchmark_duration_packed (
+  `benchmark_id` INTEGER NOT NULL PRIMARY KEY
+                         REFERENCES benchmark('id')
+                         ON UPDATE CASCADE ON DELETE RESTRICT,
+  `benchmark_type` VARCHAR(50) NOT NULL,
+
+  `repetitions` INTEGER NOT NULL,
+  `nanoseconds` BLOB NOT NULL,
+
+  FOREIGN KEY (`benchmark_id`, `benchmark_type`)
+      REFERENCES benchmark(`id`, `type`)
+      ON UPDATE CASCADE ON DELETE RESTRICT,
+  CHECK(`benchmark_type` == 'size_vs_time')
+  CHECK(length(`nanoseconds`) == 8 * `repetitions`)
+);
+
+-- Machine-noise telemetry, sampled before and after running a benchmark
+-- (i.e., all its repetitions).  Values are NULL when they cannot be read
+CREATE TABLE IF NOT EXISTS benchmark_environment (
+  `benchmark_id` INTEGER NOT NULL REFERENCES benchmark('id')
+                                  ON UPDATE CASCADE ON DELETE RESTRICT,
+  `phase` VARCHAR(10) NOT NULL,
+  `timestamp` INTEGER NOT NULL,  -- Unix timestamp: millisecs since epoch
+
+  `cpus` INTEGER NOT NULL,       -- Number of available processors
+  `loadavg` REAL,                -- 1-minute load average (/proc/loadavg)
+  `cpu_mhz` REAL,                -- Average CPU frequency (/proc/cpuinfo)
+  `governor` VARCHAR(50),        -- CPU frequency scaling governor
+  `steal_ticks` UNSIGNED BIG INT, -- Cumulative steal time (/proc/stat)
+  `idle_ticks` UNSIGNED BIG INT, -- Cumulative idle + iowait (/proc/stat)
+  `total_ticks` UNSIGNED BIG INT, -- Cumulative CPU time (/proc/stat)
+  `process_ticks` UNSIGNED BIG INT, -- JVM CPU time (/proc/self/stat)
+  `mem_free_bytes` UNSIGNED BIG INT, -- MemAvailable (/proc/meminfo)
+
+  PRIMARY KEY (`benchmark_id`, `phase`),
+  CHECK(`phase` == 'before' OR `phase` == 'after')
+);
+
+-- Index for selecting the benchmarks of a group (see the analysis scripts)
+CREATE INDEX IF NOT EXISTS benchmark_group_name_system
+    ON benchmark(`group`, `name`, `system`, `type`);
+
+-- Per-message latency histogram of a benchmark repetition (optional, see
+-- LatencyHistogram.scala and latency_cdf.py)
+CREATE TABLE IF NOT EXISTS benchmark_latency (
+  `benchmark_id` INTEGER NOT NULL REFERENCES benchmark('id')
+                                  ON UPDATE CASCADE ON DELETE RESTRICT,
+  `benchmark_type` VARCHAR(50) NOT NULL,
+
+  `repetition` INTEGER NOT NULL,
+  `sub_bucket_bits` INTEGER NOT NULL, -- Histogram precision
+  `count` UNSIGNED BIG INT NOT NULL,  -- Number of recorded latencies
+  -- Non-empty buckets: little-endian (uint32 index, int64 count) pairs
+  `histogram` BLOB NOT NULL,
+
+  PRIMARY KEY (`benchmark_id`, `repetition`),
+  FOREIGN KEY (`benchmark_id`, `benchmark_type`)
+      REFERENCES benchmark(`id`, `type`)
+      ON UPDATE CASCADE ON DELETE RESTRICT,
+  CHECK(`benchmark_type` == 'size_vs_time')
+);
+
+-- CPU usage of a benchmark repetition, measured around the whole benchmark
+-- run (including process system start-up and shutdown).  See CpuUsage.scala
+-- and cpu_report.py
+CREATE TABLE IF NOT EXISTS benchmark_cpu (
+  `benchmark_id` INTEGER NOT NULL REFERENCES benchmark('id')
+                                  ON UPDATE CASCADE ON DELETE RESTRICT,
+  `benchmark_type` VARCHAR(50) NOT NULL,
+
+  `repetition` INTEGER NOT NULL,
+  `cores` INTEGER NOT NULL,               -- Number of available processors
+  `wall_nanoseconds` UNSIGNED BIG INT NOT NULL,
+  `process_cpu_nanoseconds` UNSIGNED BIG INT, -- NULL if not supported
+  `peak_threads` INTEGER NOT NULL,        -- Peak number of live JVM threads
+  -- Effpi executor threads, and their CPU time (little-endian int64, one
+  -- per thread).  NULL for systems without an instrumented pool (Akka)
+  `pool_threads` INTEGER,
+  `thread_cpu_nanoseconds` BLOB,
+
+  PRIMARY KEY (`benchmark_id`, `repetition`),
+  FOREIGN KEY (`benchmark_id`, `benchmark_type`)
+      REFERENCES benchmark(`id`, `type`)
+      ON UPDATE CASCADE ON DELETE RESTRICT,
+  CHECK(`benchmark_type` == 'size_vs_time')
+);
+
+-- JDK Flight Recorder recording of all the repetitions of a benchmark
+-- (optional, see runBenchmarks).  The `path` is relative to the directory
+-- containing the DB
+CREATE TABLE IF NOT EXISTS benchmark_jfr (
+  `benchmark_id` INTEGER NOT NULL PRIMARY KEY
+                         REFERENCES benchmark('id')
+                         ON UPDATE CASCADE ON DELETE RESTRICT,
+  `path` TEXT NOT NULL,
+  `settings` VARCHAR(50) NOT NULL, -- JFR configuration, e.g. 'profile'
+  `start` INTEGER NOT NULL,        -- Unix timestamp: millisecs since epoch
+  `end` INTEGER NOT NULL           -- Unix timestamp: millisecs since epoch
+);
+
+-- Top stack frames of a JFR recording, by kind of event (see jfr_summary.py):
+--   * 'cpu': execution samples, by top frame (`total` = samples);
+--   * 'allocation': allocation samples, by allocation site (`total` =
+--     sampled bytes);
+--   * 'lock': monitor contention, by blocked method (`total` = nanoseconds);
+--   * 'park': thread parking, by parked method, excluding idle scheduler
+--     threads (`total` = nanoseconds)
+CREATE TABLE IF NOT EXISTS benchmark_jfr_summary (
+  `benchmark_id` INTEGER NOT NULL REFERENCES benchmark_jfr('benchmark_id')
+                                  ON UPDATE CASCADE ON DELETE CASCADE,
+  `kind` VARCHAR(20) NOT NULL,
+  `rank` INTEGER NOT NULL,          -- Starting from 1
+  `frame` TEXT NOT NULL,            -- e.g. "effpi.system.Executor.run"
+  `events` INTEGER NOT NULL,
+  `total` REAL NOT NULL,
+
+  PRIMARY KEY (`benchmark_id`, `kind`, `rank`),
+  CHECK(`kind` == 'cpu' OR `kind` == 'allocation' OR `kind` == 'lock'
+        OR `kind` == 'park')
+);
+
+-- Scheduler and channel backlog of an Effpi benchmark repetition, sampled
+-- periodically (optional, see BacklogSampler.scala and backlog_plot.py).
+-- Pending inputs and channels are counted from the start of the repetition
+CREATE TABLE IF NOT EXISTS benchmark_backlog (
+  `benchmark_id` INTEGER NOT NULL REFERENCES benchmark('id')
+                                  ON UPDATE CASCADE ON DELETE RESTRICT,
+  `benchmark_type` VARCHAR(50) NOT NULL,
+
+  `repetition` INTEGER NOT NULL,
+  `elapsed_nanoseconds` UNSIGNED BIG INT NOT NULL, -- Since repetition start
+  `running_processes` INTEGER NOT NULL,  -- Processes in the running queue
+  `scheduled_channels` INTEGER NOT NULL, -- Input channels in waiting queue
+  `pending_inputs` INTEGER NOT NULL,     -- Inputs waiting on channels
+  `in_channels` INTEGER NOT NULL,        -- Input channels created
+  `gc_count` INTEGER NOT NULL,           -- Cumulative GC runs
+  `gc_millis` INTEGER NOT NULL,          -- Cumulative GC time
+
+  PRIMARY KEY (`benchmark_id`, `repetition`, `elapsed_nanoseconds`),
+  FOREIGN KEY (`benchmark_id`, `benchmark_type`)
+      REFERENCES benchmark(`id`, `type`)
+      ON UPDATE CASCADE ON DELETE RESTRICT,
+  CHECK(`benchmark_type` == 'size_vs_time')
+);
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# Effpi - verified message-passing programs in Dotty
+# Copyright 2019 Alceste Scalas and Elias Benussi
+# Released under the MIT License: https://opensource.org/licenses/MIT
+
+# CPU utilisation and CPU cost per message, from the `benchmark_cpu` table.
+#
+# For each benchmark, system and size, print (as CSV) the medians over all
+# repetitions of:
+#   * the CPU utilisation: process CPU time / (wall-clock time * cores);
+#   * the executor pool utilisation: total CPU time of the Effpi executor
+#     threads / (wall-clock time * cores), and the pool imbalance (CPU time
+#     of the busiest thread / average thread CPU time);
+#   * the CPU cost per message: process CPU time / number of messages,
+#     estimated from the benchmark parameters (see MESSAGES below).
+# Utilisation and cost per message are also plotted against size.
+#
+# Usage:
+#   python3 cpu_report.py [--db FILE] [--group GID]
+import argparse
+import os
+import sqlite3
+import numpy as np
+import matplotlib.pyplot as plt
+
+from benchmark_db import PARAM_FIELDS, latest_group, group_filter
+
+SQLITE_FILE = '../benchmarks.db'
+CPU_PLOTS_PATH = './graphs/cpu/'
+
+# (Approximate) number of messages sent in a benchmark run, given the
+# benchmark parameters (in the order of PARAM_FIELDS)
+MESSAGES = {
+    # Each meeting: 2 requests, 2 replies, 2 colour exchanges; then each
+    # chameneos gets stopped with 3 messages
+    'chameneos' : lambda size, meetings: 6 * meetings + 3 * size,
+    # One message per count, plus the final request and reply
+    'counting' : lambda count: count + 2,
+    'forkjoin_creation' : lambda size: size,
+    'forkjoin_throughput' : lambda size, messages: size * messages,
+    # Each exchange is a ping and a pong; then each pair gets stopped
+    'pingpong' : lambda pairs, exchanges: pairs * (2 * exchanges + 1),
+    # One message going around for the given hops, then stopping all members
+    'ring' : lambda size, hops: hops + size,
+    'ringstream' : lambda size, hops, messages: messages * (hops + size),
+}
+
+# Per-thread CPU times: one little-endian int64 (nanoseconds) per thread
+THREAD_CPU_DTYPE = np.dtype('<i8')
+
+SYSTEMS = ['akka', 'statemachinemultistep', 'runnerimproved']
+COLORS = {'akka': 'C0', 'statemachinemultistep': 'C1', 'runnerimproved': 'C2'}
+
+
+def unpack_thread_cpu(blob):
+    return np.frombuffer(blob, dtype=THREAD_CPU_DTYPE)
+
+
+def fetch_cpu(c, gid, bench_name, system):
+    """Return a map from parameters (a tuple, starting with the size) to a
+    list of (cores, wall nanoseconds, process CPU nanoseconds, array of
+    thread CPU nanoseconds, or None)."""
+    fields = PARAM_FIELDS[bench_name]
+    group, group_params = group_filter(gid)
+    c.execute("SELECT %(f)s, cpu.`cores`, cpu.`wall_nanoseconds`, "
+              "cpu.`process_cpu_nanoseconds`, cpu.`thread_cpu_nanoseconds` "
+              "FROM benchmark "
+              "INNER JOIN benchmark_%(b)s AS b ON (benchmark.`id` = b.`id`) "
+              "INNER JOIN benchmark_cpu AS cpu "
+              "ON (benchmark.`id` = cpu.`benchmark_id`) "
+              "WHERE %(g)s AND benchmark.`name` = ? "
+              "AND benchmark.`system` = ?" % {
+                  'b': bench_name, 'g': group,
+                  'f': ', '.join('b.`%s`' % f for f in fields)},
+              group_params + (bench_name, system))
+    res = {}
+    for row in c.fetchall():
+        params = row[:len(fields)]
+        cores, wall, cpu, threads = row[len(fields):]
+        res.setdefault(params, []).append(
+            (cores, wall, cpu,
+             None if threads is None else unpack_thread_cpu(threads)))
+    return res
+
+
+def cpu_stats(bench_name, params, reps):
+    """Return the median utilisation, pool utilisation, pool imbalance and
+    CPU cost per message (in microseconds) of the given repetitions.  Values
+    that cannot be computed are NaN."""
+    messages = MESSAGES[bench_name](*params)
+    util, pool_util, imbalance, per_msg = [], [], [], []
+    for cores, wall, cpu, threads in reps:
+        if cpu is not None and wall > 0:
+            util.append(cpu / (wall * cores))
+            per_msg.append(cpu / messages / 1000)
+        if threads is not None and len(threads) > 0 and wall > 0:
+            pool_util.append(threads.sum() / (wall * cores))
+            if threads.mean() > 0:
+                imbalance.append(threads.max() / threads.mean())
+    def median(xs):
+        return np.median(xs) if xs else np.nan
+    return (median(util), median(pool_util), median(imbalance),
+            median(per_msg))
+
+
+def plot_cpu(bench_name, stats):
+    """Plot utilisation and CPU per message vs. size, for all systems."""
+    f, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 4))
+    for system, rows in stats.items():
+        sizes = [r[0] for r in rows]
+        ax1.semilogx(sizes, [r[1] for r in rows], 'o-',
+                     color=COLORS.get(system), label=system)
+        ax1.semilogx(sizes, [r[2] for r in rows], 'x--',
+                     color=COLORS.get(system), label=system + ' (pool)')
+        ax2.loglog(sizes, [r[4] for r in rows], 'o-',
+                   color=COLORS.get(system), label=system)
+    ax1.set_xlabel('Size')
+    ax1.set_ylabel('CPU utilisation (CPU time / (wall time × cores))')
+    ax1.legend(fontsize='small')
+    ax2.set_xlabel('Size')
+    ax2.set_ylabel('CPU time per message (μs)')
+    ax2.legend(fontsize='small')
+    f.suptitle(bench_name)
+    f.savefig('{}{}.pdf'.format(CPU_PLOTS_PATH, bench_name),
+              bbox_inches='tight')
+    plt.close(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Report CPU utilisation and CPU cost per message')
+    parser.add_argument('--db', default=SQLITE_FILE,
+                        help='SQLite DB file (default: %(default)s)')
+    parser.add_argument('--group', type=int,
+                        help='Benchmark group (default: latest completed)')
+    args = parser.parse_args()
+
+    os.makedirs(CPU_PLOTS_PATH, exist_ok=True)
+    with sqlite3.connect('file:{}?mode=ro'.format(args.db), uri=True) as conn:
+        c = conn.cursor()
+        gid = args.group if args.group is not None else latest_group(c)
+
+        print('benchmark,system,size,messages,utilisation,pool_utilisation,'
+              'pool_imbalance,cpu_us_per_message')
+        for bn in MESSAGES:
+            stats = {}
+            for system in SYSTEMS:
+                cpu = fetch_cpu(c, gid, bn, system)
+                for params, reps in sorted(cpu.items()):
+                    s = cpu_stats(bn, params, reps)
+                    stats.setdefault(system, []).append((params[0],) + s)
+                    print('{},{},{},{},'.format(bn, system, params[0],
+                                                MESSAGES[bn](*params)) +
+                          ','.join('%.4f' % v for v in s))
+            if stats:
+                plot_cpu(bn, stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,5 +5,10 @@ REPETITIONS=${1:-1}
 sbt ";clean;benchmarks/clean"
 sbt benchmarks/assembly
 
-./scripts/runBenchmarks $REPETITIONS
+# Create any DB tables added since benchmarks.db was set up
+./scripts/setup-runtime-benchmarks.sh
+
+# Further arguments (if any) select a group and its "benchmark:system" cells
+# to re-run (see runBenchmarks)
+./scripts/runBenchmarks $REPETITIONS "${@:2}"
 rm -f hs_err*.log
@@ -3,6 +3,7 @@
 # Copyright 2019 Alceste Scalas and Elias Benussi
 # Released under the MIT License: https://opensource.org/licenses/MIT
 
+import argparse
 import itertools
 import operator
 from ast import literal_eval
@@ -10,11 +11,20 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.ticker import ScalarFormatter
 
+from benchmark_db import SIZE_FIELDS, latest_group, group_filter
+import profiling
+
 SQLITE_FILE = '../benchmarks.db'
 GENERAL_PLOTS_PATH = './graphs/memory/general/'
 BAR_PLOTS_PATH = './graphs/memory/'
 PS_PLOTS_PATH = './graphs/memory/processsystem/'
 
+# Benchmark group to plot (see --group); None means the latest completed
+GROUP_ID = None
+
+# Stage-level profiler (see --profile)
+PROFILER = profiling.Profiler(enabled=False)
+
 Y_AXIS_LABEL = "Max GC memory (MB)"
 BENCHNAMES = [
     ("chameneos", "Chameneos: number of chameneos", Y_AXIS_LABEL),
@@ -36,41 +46,44 @@ PSNAMES = [
 def gc_usage_vs_size():
     for bn, xl, yl in BENCHNAMES:
         print('Generating size vs. GC usage for benchmark: ' + bn)
-        gc_usage_vs_size_per_benchmark(bn, xl, yl)
+        with PROFILER.stage('plot', benchmark=bn):
+            gc_usage_vs_size_per_benchmark(bn, xl, yl)
 
 
 def gc_usage_vs_size_per_benchmark(benchname, xl, yl):
-    (fig_w, fig_h) = (4, 4)
-    f = plt.figure(figsize=(fig_w, fig_h))
-    gs = plt.GridSpec(2, 1)
-    ax1 = plt.subplot(gs[0, :])
-    ax2 = plt.subplot(gs[1, :], sharex=ax1)
-
     points = assemble_data(benchname, PSNAMES)
 
-    for psName, sizes, records, _e, avg_calls, sty in points:
-        records = [r / 1000000 for r in records]
-        ax1.loglog(sizes, records, marker='o', markersize=6, linestyle=sty)
+    with PROFILER.stage('render', benchmark=benchname):
+        (fig_w, fig_h) = (4, 4)
+        f = plt.figure(figsize=(fig_w, fig_h))
+        gs = plt.GridSpec(2, 1)
+        ax1 = plt.subplot(gs[0, :])
+        ax2 = plt.subplot(gs[1, :], sharex=ax1)
 
-    for psName, sizes, records, _e, avg_calls, sty in points:
-        ax2.loglog(sizes, avg_calls, marker='o', markersize=6, linestyle=sty)
-
-    ax2.set_xscale("log")
-
-    ax2.set_xlabel(xl)
-    ax1.get_xaxis().set_visible(False)
-    # ax1.set_ylabel(yl, rotation=0)
-    # ax2.set_ylabel('Number of GC calls', rotation=0)
-    ax1.text(-0.1, 1.15, yl, fontsize=12, transform=ax1.transAxes,
-        verticalalignment='top')
-    ax2.text(
-        -0.1, 1.15, 'Number of GC calls',
-        fontsize=12, transform=ax2.transAxes,
-        verticalalignment='top'
-    )
+        for psName, sizes, records, _e, avg_calls, sty in points:
+            records = [r / 1000000 for r in records]
+            ax1.loglog(sizes, records, marker='o', markersize=6, linestyle=sty)
 
-    f.savefig('{}{}.pdf'.format(BAR_PLOTS_PATH, benchname), bbox_inches='tight')
-    plt.close(f)
+        for psName, sizes, records, _e, avg_calls, sty in points:
+            ax2.loglog(sizes, avg_calls, marker='o', markersize=6, linestyle=sty)
+
+        ax2.set_xscale("log")
+
+        ax2.set_xlabel(xl)
+        ax1.get_xaxis().set_visible(False)
+        # ax1.set_ylabel(yl, rotation=0)
+        # ax2.set_ylabel('Number of GC calls', rotation=0)
+        ax1.text(-0.1, 1.15, yl, fontsize=12, transform=ax1.transAxes,
+            verticalalignment='top')
+        ax2.text(
+            -0.1, 1.15, 'Number of GC calls',
+            fontsize=12, transform=ax2.transAxes,
+            verticalalignment='top'
+        )
+
+    with PROFILER.stage('write', benchmark=benchname):
+        f.savefig('{}{}.pdf'.format(BAR_PLOTS_PATH, benchname), bbox_inches='tight')
+        plt.close(f)
 
 
 def gc_calls_vs_size_barchart():
@@ -155,63 +168,65 @@ def fetch_data(bench_name, system, gid = None):
         conn.row_factory = sqlite3.Row
         c = conn.cursor()
 
-        if gid is None:
-            # Select the latest benchmark group id
-            c.execute("SELECT `id` FROM benchmark_group "
-                      "WHERE `end` IS NOT NULL "
-                      "ORDER BY `end` DESC LIMIT 1")
-            gid = c.fetchone()['id']
-
-        # Which DB field is the "size", for the x-axis of the plot?
-        size_fields = {
-            'chameneos' : 'size',
-            'counting' : 'count',
-            'pingpong' : 'pairs',
-            'forkjoin_creation' : 'size',
-            'forkjoin_throughput' : 'size',
-            'ring' : 'size',
-            'ringstream' : 'size'
-        }
-        size_field = size_fields[bench_name]
-
-        # Select id,size pairs for all benchmkars with given name and group
-        c.execute("SELECT benchmark.`id`, %(b)s.`%(f)s` "
-                  "FROM benchmark "
-                  "INNER JOIN %(b)s "
-                  "ON (benchmark.`id` = %(b)s.`id`) "
-                  "WHERE benchmark.`group` = ? AND benchmark.`name` = ? "
-                  "AND benchmark.`system` = ? "
-                  "AND benchmark.`type` = 'size_vs_memory'" % {
-                      'b' : 'benchmark_' + bench_name,
-                      'f' : size_field
-                  },
-                  (gid, bench_name, system))
-        id_sizes = c.fetchall()
-        bench_ids = [r['id'] for r in id_sizes]
-        sizes = [r[size_field] for r in id_sizes]
-
-        records = [c.execute("SELECT `max_bytes` "
-                                      "FROM benchmark_memory "
-                                      "WHERE `benchmark_id` = ?",
-                                      (bid,)).fetchall()
-                   for bid in bench_ids]
-
-        calls = [c.execute("SELECT `calls` "
-                                      "FROM benchmark_memory "
-                                      "WHERE `benchmark_id` = ?",
-                                      (bid,)).fetchall()
-                   for bid in bench_ids]
-
-        # avg_records = [np.average(r) for r in records]
-        # errors = [np.std(r) for r in records]
-        # avg_calls = [int(np.average(c)) for c in calls]
-        avg_records = [empty_safe_avg(r) for r in records]
-        avg_calls = [empty_safe_avg(c) for c in calls]
-        # errors = empty_safe_std(records)
-        # avg_calls = empty_safe_avg(calls)
-        # avg_records = [1 for r in records]
-        errors =[empty_safe_std(r) for r in records]
-        # avg_calls =[1 for r in records]
+        with PROFILER.stage('query', benchmark=bench_name, system=system):
+            if gid is None:
+                gid = GROUP_ID if GROUP_ID is not None else latest_group(c)
+
+            # Which DB field is the "size", for the x-axis of the plot?
+            size_field = SIZE_FIELDS[bench_name]
+            group, group_params = group_filter(gid)
+
+            # Select id,size pairs for all benchmkars with given name and group
+            c.execute("SELECT benchmark.`id`, %(b)s.`%(f)s` "
+                      "FROM benchmark "
+                      "INNER JOIN %(b)s "
+                      "ON (benchmark.`id` = %(b)s.`id`) "
+                      "WHERE %(g)s AND benchmark.`name` = ? "
+                      "AND benchmark.`system` = ? "
+                      "AND benchmark.`type` = 'size_vs_memory'" % {
+                          'b' : 'benchmark_' + bench_name,
+                          'f' : size_field,
+                          'g' : group
+                      },
+                      group_params + (bench_name, system))
+            id_sizes = c.fetchall()
+            bench_ids = [r['id'] for r in id_sizes]
+            sizes = [r[size_field] for r in id_sizes]
+
+            records = [c.execute("SELECT `max_bytes` "
+                                          "FROM benchmark_memory "
+                                          "WHERE `benchmark_id` = ?",
+                                          (bid,)).fetchall()
+                       for bid in bench_ids]
+
+            calls = [c.execute("SELECT `calls` "
+                                          "FROM benchmark_memory "
+                                          "WHERE `benchmark_id` = ?",
+                                          (bid,)).fetchall()
+                       for bid in bench_ids]
+
+            PROFILER.count(
+                rows=len(id_sizes) + sum(len(r) + len(cs)
+                                         for r, cs in zip(records, calls)),
+                nbytes=(profiling.rows_bytes(id_sizes) +
+                        sum(profiling.rows_bytes(r) + profiling.rows_bytes(cs)
+                            for r, cs in zip(records, calls))))
+
+        with PROFILER.stage('decode', benchmark=bench_name, system=system):
+            records = [[r['max_bytes'] for r in rs] for rs in records]
+            calls = [[r['calls'] for r in cs] for cs in calls]
+
+        with PROFILER.stage('aggregate', benchmark=bench_name, system=system):
+            # avg_records = [np.average(r) for r in records]
+            # errors = [np.std(r) for r in records]
+            # avg_calls = [int(np.average(c)) for c in calls]
+            avg_records = [empty_safe_avg(r) for r in records]
+            avg_calls = [empty_safe_avg(c) for c in calls]
+            # errors = empty_safe_std(records)
+            # avg_calls = empty_safe_avg(calls)
+            # avg_records = [1 for r in records]
+            errors =[empty_safe_std(r) for r in records]
+            # avg_calls =[1 for r in records]
 
         return filter_out_empty_records(
             sizes, avg_records, errors, records, avg_calls)
@@ -233,10 +248,27 @@ def filter_out_empty_records(sizes, avg_rs, errs, rs, avg_calls):
 
 
 def main():
+    global GROUP_ID, PROFILER
+
+    parser = argparse.ArgumentParser(description='Plot size vs. GC memory')
+    parser.add_argument('--group', type=int,
+                        help='Benchmark group (default: latest completed)')
+    parser.add_argument('--profile', nargs='?', metavar='FILE',
+                        const='profile_gc_memory_vs_size.json',
+                        help='Time each analysis stage, and write a trace '
+                        'to FILE (default: %(const)s)')
+    args = parser.parse_args()
+    GROUP_ID = args.group
+    PROFILER = profiling.Profiler(enabled=args.profile is not None)
+
     # plot_memory_vs_size_general()
     # gc_calls_vs_size_barchart()
     gc_usage_vs_size()
 
+    if args.profile is not None:
+        PROFILER.write(args.profile)
+        PROFILER.print_summary()
+
     # plot_memory_vs_size_error_bar()
 
 if __name__ == "__main__":
@@ -33,6 +33,9 @@ OPTIMISATIONS = [
 
 PSNAMES = [('original', '--')] + OPTIMISATIONS
 
+# Maximum number of outliers drawn in each box of a box plot
+MAX_FLIERS = 50
+
 
 
 def plot_time_vs_threads():
@@ -42,13 +45,13 @@ def plot_time_vs_threads():
 
 
 def plot_time_vs_threads_single(benchname, psName):
-    f = plt.figure()
+    f, ax = plt.subplots()
 
-    sizes, records, errors, raw_records = fetch_data(
+    sizes, records, errors, stats = fetch_data(
         '{}{}_{}.csv'.format(DATA_TPC_PATH, benchname, psName))
 
     #plt.errorbar(sizes, records, yerr=errors, marker='o', markersize=3, ecolor='r')
-    plt.boxplot(raw_records, labels=sizes)
+    ax.bxp(stats)
 
     plt.xlabel('Threads per CPU core')
     plt.ylabel('Time (milliseconds)')
@@ -64,13 +67,13 @@ def plot_time_vs_size_error_bar():
 
 
 def plot_time_vs_size_error_bar_single(benchname, psName, xl, yl):
-    f = plt.figure()
+    f, ax = plt.subplots()
 
-    sizes, records, errors, raw_records = fetch_data(
+    sizes, records, errors, stats = fetch_data(
         '{}{}_{}.csv'.format(DATA_SIZE_PATH, benchname, psName))
 
     # plt.errorbar(np.log10(sizes), np.log10(records), yerr=np.log10(errors), marker='o', markersize=3, ecolor='r')
-    plt.boxplot(raw_records, labels=sizes)
+    ax.bxp(stats)
 
     plt.xlabel('Number of actors')
     plt.ylabel('Time (milliseconds)')
@@ -111,7 +114,7 @@ def assemble_data(benchname, PSNAMES):
     points = []
 
     for psName, sty in PSNAMES:
-        sizes, avg_records, e, raw_records = fetch_data(
+        sizes, avg_records, e, _stats = fetch_data(
             '{}{}_{}.csv'.format(DATA_SIZE_PATH, benchname, psName))
         points.append((psName, sizes, avg_records, e, sty))
 
@@ -136,8 +139,34 @@ def fetch_data(filename):
 
         avg_records = [np.average(r) for r in records]
         errors = [np.std(r) for r in records]
-
-        return sizes, avg_records, errors, records
+        stats = [box_stats(r, size) for r, size in zip(records, sizes)]
+
+        return sizes, avg_records, errors, stats
+
+
+def box_stats(records, label, whis=1.5, max_fliers=MAX_FLIERS):
+    """Summarise the samples in `records` as the statistics drawn by a box
+    plot (see matplotlib.axes.Axes.bxp), keeping at most `max_fliers`
+    outliers."""
+    x = np.asarray(records)
+    q1, med, q3 = np.percentile(x, [25, 50, 75])
+    iqr = q3 - q1
+
+    # Whiskers reach the farthest samples within `whis` IQRs from the box
+    inside_lo = x[x >= q1 - whis * iqr]
+    inside_hi = x[x <= q3 + whis * iqr]
+    whislo = inside_lo.min() if len(inside_lo) else q1
+    whishi = inside_hi.max() if len(inside_hi) else q3
+
+    fliers = np.sort(x[(x < whislo) | (x > whishi)])
+    if len(fliers) > max_fliers:
+        # Deterministic sample: evenly spaced ranks, including the extremes
+        idx = np.linspace(0, len(fliers) - 1, max_fliers).round().astype(int)
+        fliers = fliers[idx]
+
+    return {'label': label, 'mean': np.mean(x), 'med': med,
+            'q1': q1, 'q3': q3, 'whislo': whislo, 'whishi': whishi,
+            'fliers': fliers}
 
 
 def main():
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# Effpi - verified message-passing programs in Dotty
+# Copyright 2019 Alceste Scalas and Elias Benussi
+# Released under the MIT License: https://opensource.org/licenses/MIT
+
+# Single-pass benchmark report: read a benchmark group once, aggregate it,
+# and write one self-contained (offline) HTML file with embedded JSON
+# summaries and client-side charts for every benchmark, system and metric.
+#
+# Usage:
+#   python3 html_report.py [--db FILE] [--group GID] [--baseline SYSTEM]
+#                          [--output FILE]
+import argparse
+import json
+import sqlite3
+import numpy as np
+
+from archive_durations import unpack_durations, has_packed_table
+from benchmark_db import sizes_subquery, latest_group, group_filter
+
+SQLITE_FILE = '../benchmarks.db'
+REPORT_FILE = './graphs/report.html'
+
+# Metrics: (id, description)
+METRICS = [
+    ('time', 'Time (ms)'),
+    ('memory', 'Max GC memory (MB)'),
+    ('gc_calls', 'Number of GC calls'),
+]
+
+# System used as the denominator of the ratios
+BASELINE = 'akka'
+
+
+def fetch_samples(c, gid):
+    """Return a map from (metric, benchmark, system, size) to the list of
+    samples of that metric, for the given group."""
+    samples = {}
+    def add(metric, rows, scale):
+        for name, system, size, v in rows:
+            samples.setdefault((metric, name, system, size), []).append(v / scale)
+
+    join = ("FROM benchmark INNER JOIN (%s) AS s "
+            "ON (benchmark.`id` = s.`id`) " % sizes_subquery())
+    group, group_params = group_filter(gid)
+    c.execute("SELECT benchmark.`name`, benchmark.`system`, s.`size`, "
+              "d.`nanoseconds` " + join +
+              "INNER JOIN benchmark_duration AS d "
+              "ON (benchmark.`id` = d.`benchmark_id`) "
+              "WHERE " + group, group_params)
+    add('time', c.fetchall(), 1000000)
+
+    if has_packed_table(c):
+        c.execute("SELECT benchmark.`name`, benchmark.`system`, s.`size`, "
+                  "p.`nanoseconds` " + join +
+                  "INNER JOIN benchmark_duration_packed AS p "
+                  "ON (benchmark.`id` = p.`benchmark_id`) "
+                  "WHERE " + group, group_params)
+        for name, system, size, blob in c.fetchall():
+            samples.setdefault(('time', name, system, size), []).extend(
+                unpack_durations(blob) / 1000000)
+
+    c.execute("SELECT benchmark.`name`, benchmark.`system`, s.`size`, "
+              "m.`max_bytes`, m.`calls` " + join +
+              "INNER JOIN benchmark_memory AS m "
+              "ON (benchmark.`id` = m.`benchmark_id`) "
+              "WHERE " + group, group_params)
+    rows = c.fetchall()
+    add('memory', [r[:4] for r in rows], 1000000)
+    add('gc_calls', [r[:3] + (r[4],) for r in rows], 1)
+    return samples
+
+
+def summarise(samples, baseline):
+    """Aggregate the samples: return a nested map
+    metric -> benchmark -> system -> list of per-size summaries."""
+    summary = {}
+    for (metric, name, system, size), vs in sorted(samples.items()):
+        x = np.asarray(vs, dtype=float)
+        p50, p90, p99 = np.percentile(x, [50, 90, 99])
+        # 95% confidence interval of the mean (normal approximation)
+        ci = 1.96 * np.std(x) / np.sqrt(len(x))
+        summary.setdefault(metric, {}).setdefault(name, {}).setdefault(
+            system, []).append({
+                'size': size, 'n': len(x), 'mean': np.mean(x), 'ci': ci,
+                'min': x.min(), 'p50': p50, 'p90': p90, 'p99': p99,
+                'max': x.max()})
+
+    for benchmarks in summary.values():
+        for systems in benchmarks.values():
+            base = {s['size']: s['mean'] for s in systems.get(baseline, [])}
+            for stats in systems.values():
+                for s in stats:
+                    b = base.get(s['size'])
+                    s['ratio'] = (s['mean'] / b) if b else None
+    return summary
+
+
+def to_json(summary):
+    # Round floats, to keep the embedded data compact
+    def compact(o):
+        if isinstance(o, dict):
+            return {k: compact(v) for k, v in o.items()}
+        if isinstance(o, list):
+            return [compact(v) for v in o]
+        if isinstance(o, (float, np.floating)):
+            return float('%.4g' % o)
+        if isinstance(o, np.integer):
+            return int(o)
+        return o
+    # NOTE: escape "</" to safely embed the JSON in a <script> element
+    return json.dumps(compact(summary), separators=(',', ':')).replace('</', '<\\/')
+
+
+HTML_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Effpi benchmarks: group %(gid)s</title>
+<style>
+body { font-family: sans-serif; margin: 2em; }
+.chart { display: inline-block; margin: 0 1em 1em 0; vertical-align: top; }
+svg text { font-size: 11px; }
+table { border-collapse: collapse; font-size: 12px; margin-bottom: 2em; }
+td, th { border: 1px solid #ccc; padding: 2px 6px; text-align: right; }
+</style>
+</head>
+<body>
+<h1>Effpi benchmarks: group %(gid)s</h1>
+<p>Means with 95%% confidence intervals; ratios are w.r.t. <b>%(baseline)s</b>.</p>
+<div id="report"></div>
+<script type="application/json" id="data">%(data)s</script>
+<script>
+var METRICS = %(metrics)s;
+var COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd'];
+var data = JSON.parse(document.getElementById('data').textContent);
+var report = document.getElementById('report');
+
+function el(tag, attrs, parent) {
+  var ns = 'http://www.w3.org/2000/svg';
+  var e = ['svg', 'line', 'path', 'circle', 'text'].indexOf(tag) >= 0 ?
+    document.createElementNS(ns, tag) : document.createElement(tag);
+  for (var k in attrs) { e.setAttribute(k, attrs[k]); }
+  if (parent) { parent.appendChild(e); }
+  return e;
+}
+
+function chart(title, systems, parent) {
+  var W = 360, H = 260, L = 50, R = 10, T = 20, B = 35;
+  var pts = [];
+  for (var s in systems) { pts = pts.concat(systems[s]); }
+  var lx = function(v) { return Math.log10(Math.max(v, 1e-9)); };
+  var xs = pts.map(function(p) { return lx(p.size); });
+  var ys = pts.map(function(p) { return lx(Math.max(p.mean - p.ci, p.min)); })
+    .concat(pts.map(function(p) { return lx(p.mean + p.ci); }));
+  var x0 = Math.min.apply(null, xs), x1 = Math.max.apply(null, xs);
+  var y0 = Math.floor(Math.min.apply(null, ys)), y1 = Math.ceil(Math.max.apply(null, ys));
+  if (x1 == x0) { x1 = x0 + 1; }
+  if (y1 == y0) { y1 = y0 + 1; }
+  var px = function(v) { return L + (lx(v) - x0) / (x1 - x0) * (W - L - R); };
+  var py = function(v) { return H - B - (lx(v) - y0) / (y1 - y0) * (H - T - B); };
+
+  var div = el('div', {'class': 'chart'}, parent);
+  var svg = el('svg', {width: W, height: H}, div);
+  el('text', {x: L, y: 12}, svg).textContent = title;
+  el('line', {x1: L, y1: H - B, x2: W - R, y2: H - B, stroke: '#000'}, svg);
+  el('line', {x1: L, y1: T, x2: L, y2: H - B, stroke: '#000'}, svg);
+  for (var e = y0; e <= y1; e++) {
+    el('text', {x: 2, y: py(Math.pow(10, e)) + 4}, svg).textContent = '1e' + e;
+  }
+  pts.forEach(function(p) {
+    el('text', {x: px(p.size) - 8, y: H - B + 14}, svg).textContent = p.size;
+  });
+
+  var i = 0;
+  for (var s in systems) {
+    var color = COLORS[i %% COLORS.length];
+    var d = systems[s].map(function(p, j) {
+      return (j ? 'L' : 'M') + px(p.size) + ',' + py(p.mean);
+    }).join('');
+    el('path', {d: d, fill: 'none', stroke: color}, svg);
+    systems[s].forEach(function(p) {
+      el('line', {x1: px(p.size), x2: px(p.size), stroke: color,
+                  y1: py(Math.max(p.mean - p.ci, p.min)),
+                  y2: py(p.mean + p.ci)}, svg);
+      el('circle', {cx: px(p.size), cy: py(p.mean), r: 3, fill: color}, svg);
+    });
+    el('text', {x: W - R - 150, y: T + 12 * (i + 1), fill: color}, svg).textContent = s;
+    i++;
+  }
+}
+
+function table(systems, parent) {
+  var cols = ['size', 'n', 'mean', 'ci', 'p50', 'p90', 'p99', 'ratio'];
+  var t = el('table', {}, parent);
+  var tr = el('tr', {}, t);
+  ['system'].concat(cols).forEach(function(c) {
+    el('th', {}, tr).textContent = c;
+  });
+  for (var s in systems) {
+    systems[s].forEach(function(p) {
+      var tr = el('tr', {}, t);
+      el('td', {}, tr).textContent = s;
+      cols.forEach(function(c) {
+        el('td', {}, tr).textContent = (p[c] === null ? 'N/A' : p[c]);
+      });
+    });
+  }
+}
+
+var names = {};
+METRICS.forEach(function(m) { for (var b in (data[m[0]] || {})) { names[b] = true; } });
+Object.keys(names).sort().forEach(function(b) {
+  el('h2', {}, report).textContent = b;
+  METRICS.forEach(function(m) {
+    var systems = (data[m[0]] || {})[b];
+    if (systems) { chart(m[1], systems, report); }
+  });
+  METRICS.forEach(function(m) {
+    var systems = (data[m[0]] || {})[b];
+    if (systems) {
+      el('h3', {}, report).textContent = b + ': ' + m[1];
+      table(systems, report);
+    }
+  });
+});
+</script>
+</body>
+</html>
+'''
+
+
+def render(gid, summary, baseline):
+    return HTML_TEMPLATE % {
+        'gid': gid,
+        'baseline': baseline,
+        'data': to_json(summary),
+        'metrics': json.dumps(METRICS),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Write a self-contained HTML benchmark report')
+    parser.add_argument('--db', default=SQLITE_FILE,
+                        help='SQLite DB file (default: %(default)s)')
+    parser.add_argument('--group', type=int,
+                        help='Benchmark group (default: latest completed)')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='System used for ratios (default: %(default)s)')
+    parser.add_argument('--output', default=REPORT_FILE,
+                        help='Output HTML file (default: %(default)s)')
+    args = parser.parse_args()
+
+    with sqlite3.connect('file:{}?mode=ro'.format(args.db), uri=True) as conn:
+        c = conn.cursor()
+        gid = args.group if args.group is not None else latest_group(c)
+        samples = fetch_samples(c, gid)
+
+    summary = summarise(samples, args.baseline)
+    with open(args.output, 'w') as f:
+        f.write(render(gid, summary, args.baseline))
+    print('Report for benchmark group {} written to: {}'.format(
+        gid, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# Effpi - verified message-passing programs in Dotty
+# Copyright 2019 Alceste Scalas and Elias Benussi
+# Released under the MIT License: https://opensource.org/licenses/MIT
+
+# Bulk import of the legacy CSV benchmark results into benchmarks.db.
+#
+# The CSV files are the ones read by general_graph.py, presentation_graph.py
+# and before_and_after_performance.py:
+#   benchmarkresults/size/<bench>_<system>.csv     (size vs. time)
+#   benchmarkresults/threads/<bench>_<system>.csv  (threads per core vs. time)
+# Each CSV row is: size (integer or tuple literal), then one duration (in
+# nanoseconds) per repetition.
+#
+# Each directory is imported into a new, synthetic benchmark group.  For the
+# threads directory, the number of threads per core is stored as the
+# benchmark size.  Legacy benchmark names are mapped to the current ones;
+# legacy system names (original, runningqueue, waitqueue,...) are kept.
+#
+# Usage:
+#   python3 import_legacy_results.py [--db FILE] [--results-dir DIR]
+import argparse
+import csv
+import glob
+import os
+import sqlite3
+from ast import literal_eval
+
+from benchmark_db import PARAM_FIELDS
+
+SQLITE_FILE = '../benchmarks.db'
+DATA_PATH = '../benchmarkresults/'
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'benchmarks.sql')
+
+# Legacy benchmark names, mapped to the current ones
+LEGACY_BENCHNAMES = {
+    'chameneos' : 'chameneos',
+    'countingactor' : 'counting',
+    'forkjoincreation' : 'forkjoin_creation',
+    'forkjointhroughput' : 'forkjoin_throughput',
+    'pingpong' : 'pingpong',
+    'threadring' : 'ring',
+}
+
+# Sub-directories of DATA_PATH to import, with their group descriptions
+LEGACY_DIRS = [
+    ('size', 'Legacy import: benchmarkresults/size'),
+    ('threads', 'Legacy import: benchmarkresults/threads '
+                '(size = threads per core)'),
+]
+
+
+def read_csv(filename):
+    """Return a list of (params, nanoseconds) pairs, one per CSV row."""
+    with open(filename, newline='') as f:
+        rows = [r for r in csv.reader(f, delimiter=',', quotechar='"') if r]
+    records = []
+    for r in rows:
+        size = literal_eval(r[0])
+        params = list(size) if isinstance(size, tuple) else [size]
+        records.append((params, [int(x) for x in r[1:]]))
+    return records
+
+
+def parse_filename(filename):
+    """Return (benchmark name, system) from <bench>_<system>.csv, or None
+    if the benchmark is unknown."""
+    base = os.path.basename(filename)[:-len('.csv')]
+    if '_' not in base:
+        return None
+    legacy_bench, system = base.rsplit('_', 1)
+    bench = LEGACY_BENCHNAMES.get(legacy_bench)
+    return None if bench is None else (bench, system)
+
+
+def import_dir(c, path, description, next_id):
+    """Import all CSV files in `path` into a new benchmark group.  Return the
+    next free benchmark id, and the number of imported benchmarks."""
+    files = sorted(glob.glob(os.path.join(path, '*.csv')))
+    parsed = [(f, parse_filename(f)) for f in files]
+    for f, bs in parsed:
+        if bs is None:
+            print('Skipping unknown benchmark file: ' + f)
+    parsed = [(f, bs) for f, bs in parsed if bs is not None]
+    if not parsed:
+        return next_id, 0
+
+    # Use file modification times as (approximate) start/end timestamps,
+    # but keep legacy groups older than the existing ones: otherwise, they
+    # could be picked as the "latest" group by the plotting scripts
+    c.execute("SELECT MIN(`start`) FROM benchmark_group")
+    first_start = c.fetchone()[0]
+    mtimes = [int(os.path.getmtime(f) * 1000) for f, _bs in parsed]
+    if first_start is not None:
+        mtimes = [min(t, first_start - 1) for t in mtimes]
+    c.execute("INSERT INTO benchmark_group (`description`, `start`, `end`) "
+              "VALUES (?, ?, ?)", (description, min(mtimes), max(mtimes)))
+    gid = c.lastrowid
+
+    benchmarks = []
+    params = {}
+    durations = []
+    for (f, (bench, system)), mtime in zip(parsed, mtimes):
+        fields = PARAM_FIELDS[bench]
+        for ps, nanosecs in read_csv(f):
+            bid = next_id
+            next_id += 1
+            benchmarks.append((bid, gid, 'size_vs_time', bench, system,
+                               mtime, mtime))
+            # CSV sizes list the parameters in the order of PARAM_FIELDS;
+            # parameters missing from a legacy CSV size are stored as 0
+            ps = (ps + [0] * len(fields))[:len(fields)]
+            params.setdefault(bench, []).append([bid, bench] + ps)
+            durations.extend((bid, 'size_vs_time', rep, ns)
+                             for rep, ns in enumerate(nanosecs, start=1))
+
+    c.executemany("INSERT INTO benchmark (`id`, `group`, `type`, `name`, "
+                  "`system`, `start`, `end`) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                  benchmarks)
+    for bench, rows in params.items():
+        fields = PARAM_FIELDS[bench]
+        c.executemany("INSERT INTO benchmark_%s (`id`, `name`, %s) "
+                      "VALUES (?, ?, %s)" % (
+                          bench, ', '.join('`%s`' % f for f in fields),
+                          ', '.join('?' * len(fields))),
+                      rows)
+    c.executemany("INSERT INTO benchmark_duration (`benchmark_id`, "
+                  "`benchmark_type`, `repetition`, `nanoseconds`) "
+                  "VALUES (?, ?, ?, ?)", durations)
+    print('{}: group {}, {} benchmarks, {} repetitions'.format(
+        description, gid, len(benchmarks), len(durations)))
+    return next_id, len(benchmarks)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Import legacy benchmarkresults CSV files')
+    parser.add_argument('--db', default=SQLITE_FILE,
+                        help='SQLite DB file (default: %(default)s)')
+    parser.add_argument('--results-dir', default=DATA_PATH,
+                        help='Legacy results directory (default: %(default)s)')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        conn.execute("PRAGMA foreign_keys = ON")
+        with open(SCHEMA_FILE) as f:
+            conn.executescript(f.read())
+
+        c = conn.cursor()
+        # All imports happen in a single transaction
+        with conn:
+            c.execute("SELECT COALESCE(MAX(`id`), 0) + 1 FROM benchmark")
+            next_id = c.fetchone()[0]
+            for subdir, description in LEGACY_DIRS:
+                c.execute("SELECT `id` FROM benchmark_group "
+                          "WHERE `description` = ?", (description,))
+                if c.fetchone() is not None:
+                    print('Already imported, skipping: ' + description)
+                    continue
+                next_id, _n = import_dir(c, os.path.join(args.results_dir,
+                                                         subdir),
+                                         description, next_id)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# Effpi - verified message-passing programs in Dotty
+# Copyright 2019 Alceste Scalas and Elias Benussi
+# Released under the MIT License: https://opensource.org/licenses/MIT
+
+# Summarise the JDK Flight Recorder recordings linked to benchmarks (see
+# BENCH_JFR in runBenchmarks), and store the summaries in the
+# `benchmark_jfr_summary` table.
+#
+# Each recording is read with "jfr print --json" (from the JDK), and its
+# events are aggregated by stack frame:
+#   * cpu: execution samples, by top frame;
+#   * allocation: sampled allocated bytes, by allocation site;
+#   * lock: time blocked entering contended monitors, by blocked method;
+#   * park: time parked (e.g. waiting on a queue), by parked method.
+# For allocations, locks and parks, frames in JDK packages are skipped, so
+# e.g. a LinkedTransferQueue.take() parking is attributed to its Effpi
+# caller.  Parks of idle scheduler threads waiting for processes to run
+# (see IDLE_FRAMES) are not counted.
+#
+# Usage:
+#   python3 jfr_summary.py [--db FILE] [--jfr JFR] [--top N] [--force]
+#                          [BENCHMARK_ID ...]
+# Without benchmark ids, all recordings not yet summarised are processed.
+import argparse
+import json
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+
+SQLITE_FILE = '../benchmarks.db'
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'benchmarks.sql')
+
+# Number of frames stored for each kind of summary
+TOP_FRAMES = 20
+
+# Stack depth printed by "jfr print" (its default is 5)
+STACK_DEPTH = 64
+
+# JFR events of each kind of summary
+EVENTS = {
+    'cpu': ['jdk.ExecutionSample'],
+    # ObjectAllocationSample is only available since JDK 16
+    'allocation': ['jdk.ObjectAllocationSample',
+                   'jdk.ObjectAllocationInNewTLAB',
+                   'jdk.ObjectAllocationOutsideTLAB'],
+    'lock': ['jdk.JavaMonitorEnter'],
+    'park': ['jdk.ThreadPark'],
+}
+
+# Frames skipped when looking for allocation sites and blocked methods
+JDK_PACKAGES = ('java.', 'javax.', 'jdk.', 'sun.', 'com.sun.')
+
+# Parks under these frames are idle executor threads, not contention
+IDLE_FRAMES = ('effpi.system.SchedulingQueue.dequeue',)
+
+# ISO-8601 durations, as printed by "jfr print --json" (e.g. "PT0.0012S")
+DURATION_RE = re.compile(r'^PT(?:([\d.]+)H)?(?:([\d.]+)M)?(?:([\d.]+)S)?$')
+
+
+def jfr_tool():
+    java_home = os.environ.get('JAVA_HOME')
+    if java_home and os.path.exists(os.path.join(java_home, 'bin', 'jfr')):
+        return os.path.join(java_home, 'bin', 'jfr')
+    return shutil.which('jfr') or 'jfr'
+
+
+def read_events(jfr, path):
+    """Return the events of the given recording that are used in the
+    summaries, as parsed from "jfr print --json"."""
+    events = sorted(e for es in EVENTS.values() for e in es)
+    out = subprocess.run([jfr, 'print', '--json',
+                          '--stack-depth', str(STACK_DEPTH),
+                          '--events', ','.join(events), path],
+                         check=True, stdout=subprocess.PIPE).stdout
+    return json.loads(out)['recording']['events']
+
+
+def nanoseconds(d):
+    """Convert a JFR duration (a number of nanoseconds, or an ISO-8601
+    duration string) to nanoseconds."""
+    if isinstance(d, (int, float)):
+        return d
+    m = DURATION_RE.match(d)
+    if m is None:
+        raise ValueError('Unsupported duration: {}'.format(d))
+    h, mins, s = (float(x) if x else 0.0 for x in m.groups())
+    return ((h * 60 + mins) * 60 + s) * 1e9
+
+
+def frame_name(frame):
+    method = frame['method']
+    return '{}.{}'.format(method['type']['name'].replace('/', '.'),
+                          method['name'])
+
+
+def event_frames(values):
+    frames = (values.get('stackTrace') or {}).get('frames') or []
+    return [frame_name(f) for f in frames]
+
+
+def event_frame(values, skip_jdk):
+    """Return the top frame of the event stack trace, possibly skipping the
+    frames in JDK packages (unless all frames are)."""
+    names = event_frames(values)
+    if not names:
+        return '(no stack trace)'
+    if skip_jdk:
+        for n in names:
+            if not n.startswith(JDK_PACKAGES):
+                return n
+    return names[0]
+
+
+def summarise(events, top=TOP_FRAMES):
+    """Return a map from kind to a list of (frame, events, total), sorted by
+    decreasing total, with at most `top` elements."""
+    kinds = {e: k for k, es in EVENTS.items() for e in es}
+    totals = {k: {} for k in EVENTS}
+    for e in events:
+        kind = kinds.get(e['type'])
+        if kind is None:
+            continue
+        v = e['values']
+        if kind == 'park' and any(n in IDLE_FRAMES for n in event_frames(v)):
+            continue
+        if kind == 'cpu':
+            frame, amount = event_frame(v, False), 1
+        elif kind == 'allocation':
+            frame = event_frame(v, True)
+            amount = v.get('weight', v.get('tlabSize', v.get('allocationSize', 0)))
+        else:
+            frame, amount = event_frame(v, True), nanoseconds(v['duration'])
+        t = totals[kind].setdefault(frame, [0, 0])
+        t[0] += 1
+        t[1] += amount
+    return {k: sorted(((f, n, tot) for f, (n, tot) in t.items()),
+                      key=lambda x: -x[2])[:top]
+            for k, t in totals.items()}
+
+
+def store(conn, bench_id, summary):
+    with conn:
+        conn.execute("DELETE FROM benchmark_jfr_summary "
+                     "WHERE `benchmark_id` = ?", (bench_id,))
+        conn.executemany("INSERT INTO benchmark_jfr_summary (`benchmark_id`, "
+                         "`kind`, `rank`, `frame`, `events`, `total`) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         [(bench_id, kind, rank, f, n, tot)
+                          for kind, rows in summary.items()
+                          for rank, (f, n, tot) in enumerate(rows, start=1)])
+
+
+def print_summary(c, bench_id):
+    c.execute("SELECT `name`, `system` FROM benchmark WHERE `id` = ?",
+              (bench_id,))
+    name, system = c.fetchone()
+    print('\n# Benchmark {} ({}, {})'.format(bench_id, name, system))
+    print('kind,rank,frame,events,total')
+    c.execute("SELECT `kind`, `rank`, `frame`, `events`, `total` "
+              "FROM benchmark_jfr_summary WHERE `benchmark_id` = ? "
+              "ORDER BY `kind`, `rank`", (bench_id,))
+    for kind, rank, frame, n, tot in c.fetchall():
+        print('{},{},{},{},{:.0f}'.format(kind, rank, frame, n, tot))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Summarise the JFR recordings of benchmarks')
+    parser.add_argument('benchmarks', type=int, nargs='*',
+                        metavar='BENCHMARK_ID',
+                        help='Benchmarks to summarise (default: all the '
+                        'recordings not yet summarised)')
+    parser.add_argument('--db', default=SQLITE_FILE,
+                        help='SQLite DB file (default: %(default)s)')
+    parser.add_argument('--jfr', default=jfr_tool(),
+                        help='JDK "jfr" tool (default: %(default)s)')
+    parser.add_argument('--top', type=int, default=TOP_FRAMES,
+                        help='Frames stored for each kind of summary '
+                        '(default: %(default)s)')
+    parser.add_argument('--force', action='store_true',
+                        help='Summarise again the recordings already '
+                        'summarised')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        conn.execute("PRAGMA foreign_keys = ON")
+        # Create the JFR tables if the DB predates them
+        with open(SCHEMA_FILE) as f:
+            conn.executescript(f.read())
+        c = conn.cursor()
+
+        if args.benchmarks:
+            ids = args.benchmarks
+        else:
+            c.execute("SELECT `benchmark_id` FROM benchmark_jfr "
+                      "ORDER BY `benchmark_id`")
+            ids = [r[0] for r in c.fetchall()]
+
+        for bench_id in ids:
+            c.execute("SELECT `path` FROM benchmark_jfr "
+                      "WHERE `benchmark_id` = ?", (bench_id,))
+            row = c.fetchone()
+            if row is None:
+                print('Benchmark {}: no JFR recording'.format(bench_id))
+                continue
+            c.execute("SELECT COUNT(*) FROM benchmark_jfr_summary "
+                      "WHERE `benchmark_id` = ?", (bench_id,))
+            if c.fetchone()[0] == 0 or args.force:
+                # Recording paths are relative to the DB directory
+                path = os.path.join(os.path.dirname(os.path.abspath(args.db)),
+                                    row[0])
+                print('Summarising: {}'.format(path))
+                store(conn, bench_id,
+                      summarise(read_events(args.jfr, path), args.top))
+            elif not args.benchmarks:
+                continue # Only print newly summarised recordings
+            print_summary(c, bench_id)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# Effpi - verified message-passing programs in Dotty
+# Copyright 2019 Alceste Scalas and Elias Benussi
+# Released under the MIT License: https://opensource.org/licenses/MIT
+
+# Per-message latency CDFs, from the histograms in `benchmark_latency`.
+#
+# The histograms are recorded when running the benchmarks with
+# BENCH_JAVA_OPTS="-Deffpi.benchmarks.latency=true" (see runBenchmarks).
+# The histograms of all repetitions of a benchmark are merged, and one CDF
+# per size is plotted for each benchmark and system.
+#
+# Usage:
+#   python3 latency_cdf.py [--db FILE] [--group GID]
+import argparse
+import csv
+import os
+import sqlite3
+import numpy as np
+import matplotlib.pyplot as plt
+
+from benchmark_db import SIZE_FIELDS, latest_group, group_filter
+
+SQLITE_FILE = '../benchmarks.db'
+LATENCY_PLOTS_PATH = './graphs/latency/'
+
+# Benchmarks that can record latencies, with the x-axis label of their CDFs
+BENCHNAMES = [
+    ("pingpong", "Round-trip latency (μs)"),
+    ("ring", "Hop latency (μs)"),
+    ("ringstream", "Hop latency (μs)"),
+    ("forkjoin_throughput", "Message latency (μs)"),
+]
+
+SYSTEMS = ['statemachinemultistep', 'runnerimproved']
+
+# Buckets of known values, written by LatencyHistogram.scala: decoding must
+# put each value in the same bucket (see check_buckets)
+BUCKETS_CHECK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  'latency_buckets.csv')
+
+# Serialized histogram buckets (see LatencyHistogram.scala)
+BUCKET_DTYPE = np.dtype([('index', '<u4'), ('count', '<i8')])
+
+PERCENTILES = [50, 90, 99, 99.9]
+
+
+def num_buckets(sub_bits):
+    return (63 - (sub_bits - 1) + 1) * (1 << (sub_bits - 1))
+
+
+def decode(blob, sub_bits):
+    """Return a dense array of bucket counts from a serialized histogram."""
+    buckets = np.frombuffer(blob, dtype=BUCKET_DTYPE)
+    counts = np.zeros(num_buckets(sub_bits), dtype=np.int64)
+    counts[buckets['index']] = buckets['count']
+    return counts
+
+
+def bucket_upper_bounds(sub_bits):
+    """Return the (exclusive) upper bound of each bucket, in nanoseconds."""
+    half = 1 << (sub_bits - 1)
+    idx = np.arange(num_buckets(sub_bits), dtype=np.float64)
+    shift = np.maximum(idx // half - 1, 0)
+    lower = np.where(idx < 2 * half, idx, (idx % half + half) * 2 ** shift)
+    return lower + 2 ** shift
+
+
+def check_buckets(path=BUCKETS_CHECK_FILE):
+    """Serialize each (sub-bucket bits, value, bucket) row of the given CSV
+    file as a histogram, and check that `decode` and `bucket_upper_bounds`
+    put the value in its bucket.  Raise ValueError otherwise."""
+    with open(path, newline='') as f:
+        rows = [tuple(int(x) for x in r) for r in list(csv.reader(f))[1:]]
+    for sub_bits, value, index in rows:
+        if not 0 <= index < num_buckets(sub_bits):
+            raise ValueError('{}: bucket {} of {} out of range'.format(
+                path, index, value))
+        blob = np.array([(index, 1)], dtype=BUCKET_DTYPE).tobytes()
+        decoded = np.flatnonzero(decode(blob, sub_bits)).tolist()
+        # Bucket boundaries are integers (below 2^64), exact as float64
+        upper = bucket_upper_bounds(sub_bits)
+        lower = int(upper[index - 1]) if index > 0 else 0
+        if decoded != [index] or not lower <= value < int(upper[index]):
+            raise ValueError(
+                '{}: bucket {} of {} decoded as {}, with bounds [{}, {}) '
+                '({} sub-bucket bits): does latency_cdf.py match '
+                'LatencyHistogram.scala?'.format(
+                    path, index, value, decoded, lower,
+                    int(upper[index]), sub_bits))
+
+
+def fetch_histograms(c, gid, bench_name, system):
+    """Return a list of (size, merged bucket counts, sub-bucket bits) for
+    the given benchmark and system, sorted by size."""
+    group, group_params = group_filter(gid)
+    c.execute("SELECT b.`%(f)s` AS `size`, l.`sub_bucket_bits`, l.`histogram` "
+              "FROM benchmark "
+              "INNER JOIN benchmark_%(b)s AS b ON (benchmark.`id` = b.`id`) "
+              "INNER JOIN benchmark_latency AS l "
+              "ON (benchmark.`id` = l.`benchmark_id`) "
+              "WHERE %(g)s AND benchmark.`name` = ? "
+              "AND benchmark.`system` = ?" % {'b': bench_name, 'g': group,
+                                               'f': SIZE_FIELDS[bench_name]},
+              group_params + (bench_name, system))
+    merged = {}
+    for size, sub_bits, blob in c.fetchall():
+        counts = decode(blob, sub_bits)
+        if size in merged:
+            assert merged[size][1] == sub_bits, 'Incompatible histograms'
+            merged[size][0] += counts
+        else:
+            merged[size] = [counts, sub_bits]
+    return [(size, counts, sub_bits)
+            for size, (counts, sub_bits) in sorted(merged.items())]
+
+
+def percentiles(counts, bounds, ps):
+    """Return the given percentiles (upper bucket bounds, in nanoseconds)."""
+    cdf = np.cumsum(counts) / counts.sum()
+    return [bounds[np.searchsorted(cdf, p / 100)] for p in ps]
+
+
+def plot_latency_cdf(bench_name, system, xl, histograms):
+    f, ax = plt.subplots()
+    for size, counts, sub_bits in histograms:
+        bounds = bucket_upper_bounds(sub_bits)
+        nonzero = counts > 0
+        cdf = np.cumsum(counts)[nonzero] / counts.sum()
+        ax.semilogx(bounds[nonzero] / 1000, cdf, drawstyle='steps-post',
+                    label=str(size))
+
+    plt.xlabel(xl)
+    plt.ylabel('Fraction of messages')
+    plt.legend(title='Size', loc='lower right')
+
+    f.savefig('{}{}_{}.pdf'.format(LATENCY_PLOTS_PATH, bench_name, system),
+              bbox_inches='tight')
+    plt.close(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Plot latency CDFs')
+    parser.add_argument('--db', default=SQLITE_FILE,
+                        help='SQLite DB file (default: %(default)s)')
+    parser.add_argument('--group', type=int,
+                        help='Benchmark group (default: latest completed)')
+    args = parser.parse_args()
+
+    check_buckets()
+    os.makedirs(LATENCY_PLOTS_PATH, exist_ok=True)
+    with sqlite3.connect('file:{}?mode=ro'.format(args.db), uri=True) as conn:
+        c = conn.cursor()
+        gid = args.group if args.group is not None else latest_group(c)
+
+        print('benchmark,system,size,messages,' +
+              ','.join('p{}_us'.format(p) for p in PERCENTILES))
+        for bn, xl in BENCHNAMES:
+            for system in SYSTEMS:
+                histograms = fetch_histograms(c, gid, bn, system)
+                if not histograms:
+                    continue
+                for size, counts, sub_bits in histograms:
+                    ps = percentiles(counts, bucket_upper_bounds(sub_bits),
+                                     PERCENTILES)
+                    print('{},{},{},{},'.format(bn, system, size, counts.sum()) +
+                          ','.join('%.2f' % (p / 1000) for p in ps))
+                plot_latency_cdf(bn, system, xl, histograms)
+
+
+if __name__ == "__main__":
+    main()
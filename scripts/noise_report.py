@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# Effpi - verified message-passing programs in Dotty
+# Copyright 2019 Alceste Scalas and Elias Benussi
+# Released under the MIT License: https://opensource.org/licenses/MIT
+
+# Machine-noise report for a benchmark group.
+#
+# Correlates the environment samples in `benchmark_environment` (taken
+# before and after each benchmark) with the outliers among the benchmark
+# durations, and lists the noisy benchmark cells.
+#
+# Only signals that the benchmark cannot cause itself are used: the CPU
+# time used by other processes while the benchmark runs (i.e., busy CPU
+# time not spent by the benchmark JVM), steal time, and a shortage of
+# available memory.  The load average is not used: right after a previous
+# benchmark size (or cell), it mostly reflects the benchmarks themselves.
+# A benchmark is noisy when such a signal agrees with outliers among its
+# durations.  With --requeue, prints
+# the runBenchmarks command line for re-running them in a new group; the
+# analysis scripts then take those cells from the re-run (see
+# benchmark_db.group_filter).
+#
+# Usage:
+#   python3 noise_report.py [--group GID] [--max-other-cpu P]
+#                           [--max-steal S] [--min-mem MB]
+#                           [--min-outliers F] [--requeue]
+import argparse
+import sqlite3
+import numpy as np
+
+from archive_durations import fetch_durations, has_packed_table
+from benchmark_db import latest_group, group_filter
+
+SQLITE_FILE = '../benchmarks.db'
+
+# Default thresholds for noisy benchmarks
+MAX_OTHER_CPU = 5.0 # Percentage of CPU time used by other processes
+MAX_STEAL = 1.0     # Percentage of CPU time stolen during the benchmark
+MIN_MEM_MB = 512    # Minimum available memory, before and after
+MIN_OUTLIERS = 0.0  # Fraction of durations that must be exceeded by outliers
+
+# Durations farther than this number of (scaled) MADs from the median
+# are considered outliers
+OUTLIER_MADS = 3
+
+NOISE_METRICS = ['other_cpu', 'steal', 'mhz_drop', 'mem_free_mb']
+
+
+def noise_metrics(before, after):
+    """Return the noise metrics of a benchmark, given its environment
+    samples (as sqlite3.Row).  Unavailable metrics are NaN."""
+    def val(x):
+        return np.nan if x is None else float(x)
+    def delta(field):
+        # NOTE: older DBs may lack some fields
+        if field not in before.keys():
+            return np.nan
+        return val(after[field]) - val(before[field])
+
+    dtotal = delta('total_ticks')
+    dsteal = delta('steal_ticks')
+    # Busy CPU time not spent by steal or by the benchmark JVM itself
+    dother = dtotal - delta('idle_ticks') - dsteal - delta('process_ticks')
+    return {
+        'other_cpu': (max(dother, 0.0) / dtotal * 100) if dtotal > 0 else np.nan,
+        'steal': (dsteal / dtotal * 100) if dtotal > 0 else np.nan,
+        'mhz_drop': ((val(before['cpu_mhz']) - val(after['cpu_mhz']))
+                     / val(before['cpu_mhz']) * 100),
+        'mem_free_mb': min(val(before['mem_free_bytes']),
+                           val(after['mem_free_bytes'])) / 1000000,
+        'governor': before['governor'] or after['governor'],
+    }
+
+
+def outlier_fraction(durations):
+    """Fraction of durations that are outliers w.r.t. the median."""
+    if len(durations) == 0:
+        return np.nan
+    med = np.median(durations)
+    mad = 1.4826 * np.median(np.abs(durations - med))
+    if mad == 0:
+        return 0.0
+    return float(np.mean(np.abs(durations - med) > OUTLIER_MADS * mad))
+
+
+def fetch_cells(c, gid):
+    """Return one dict for each size_vs_time benchmark of the given group
+    having environment samples: benchmark id, name, system, noise metrics,
+    outlier fraction and coefficient of variation of its durations."""
+    group, group_params = group_filter(gid)
+    c.execute("SELECT benchmark.`id`, benchmark.`name`, benchmark.`system`, "
+              "e.* "
+              "FROM benchmark "
+              "INNER JOIN benchmark_environment AS e "
+              "ON (benchmark.`id` = e.`benchmark_id`) "
+              "WHERE " + group + " "
+              "AND benchmark.`type` = 'size_vs_time' "
+              "ORDER BY benchmark.`id`", group_params)
+    samples = {}
+    for r in c.fetchall():
+        samples.setdefault((r['id'], r['name'], r['system']), {})[r['phase']] = r
+
+    packed = has_packed_table(c)
+    cells = []
+    for (bid, name, system), phases in samples.items():
+        if 'before' not in phases or 'after' not in phases:
+            continue
+        d = fetch_durations(c, bid, packed).astype(float)
+        cell = {'id': bid, 'name': name, 'system': system,
+                'outliers': outlier_fraction(d),
+                'cv': (np.std(d) / np.mean(d)) if len(d) else np.nan}
+        cell.update(noise_metrics(phases['before'], phases['after']))
+        cells.append(cell)
+    return cells
+
+
+def is_noisy(cell, max_other_cpu, max_steal, min_mem_mb, min_outliers):
+    """A benchmark is noisy if the machine was disturbed while it ran, and
+    its durations have outliers."""
+    # NOTE: comparisons with NaN (i.e., unavailable metrics) are False
+    disturbed = (cell['other_cpu'] > max_other_cpu
+                 or cell['steal'] > max_steal
+                 or cell['mem_free_mb'] < min_mem_mb)
+    return disturbed and cell['outliers'] > min_outliers
+
+
+def noisy_benchmark_ids(c, gid, max_other_cpu=MAX_OTHER_CPU,
+                        max_steal=MAX_STEAL, min_mem_mb=MIN_MEM_MB,
+                        min_outliers=MIN_OUTLIERS):
+    """Return the ids of the noisy benchmarks in the given group."""
+    return {cell['id'] for cell in fetch_cells(c, gid)
+            if is_noisy(cell, max_other_cpu, max_steal, min_mem_mb,
+                        min_outliers)}
+
+
+def correlations(cells):
+    """Return the correlation between each noise metric and the duration
+    outliers and coefficient of variation, ignoring unavailable metrics."""
+    corrs = {}
+    for m in NOISE_METRICS:
+        for target in ['outliers', 'cv']:
+            xy = np.array([(cell[m], cell[target]) for cell in cells])
+            if len(xy) == 0:
+                continue
+            xy = xy[~np.isnan(xy).any(axis=1)]
+            if len(xy) < 3 or np.std(xy[:, 0]) == 0 or np.std(xy[:, 1]) == 0:
+                corrs[(m, target)] = np.nan
+            else:
+                corrs[(m, target)] = np.corrcoef(xy[:, 0], xy[:, 1])[0, 1]
+    return corrs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Report machine noise during a benchmark group')
+    parser.add_argument('--db', default=SQLITE_FILE,
+                        help='SQLite DB file (default: %(default)s)')
+    parser.add_argument('--group', type=int,
+                        help='Benchmark group (default: latest completed)')
+    parser.add_argument('--max-other-cpu', type=float, default=MAX_OTHER_CPU,
+                        help='Max %% of CPU time used by other processes '
+                        'during a benchmark (default: %(default)s)')
+    parser.add_argument('--max-steal', type=float, default=MAX_STEAL,
+                        help='Max %% of CPU time stolen during a benchmark '
+                        '(default: %(default)s)')
+    parser.add_argument('--min-mem', type=float, default=MIN_MEM_MB,
+                        help='Min available memory, in MB '
+                        '(default: %(default)s)')
+    parser.add_argument('--min-outliers', type=float, default=MIN_OUTLIERS,
+                        help='Fraction of outlier durations to exceed, for a '
+                        'disturbed benchmark to be noisy '
+                        '(default: %(default)s)')
+    parser.add_argument('--requeue', action='store_true',
+                        help='Print the command for re-running noisy cells')
+    args = parser.parse_args()
+
+    with sqlite3.connect('file:{}?mode=ro'.format(args.db), uri=True) as conn:
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        gid = args.group if args.group is not None else latest_group(c)
+        cells = fetch_cells(c, gid)
+
+    if not cells:
+        print('No environment samples for benchmark group {}'.format(gid))
+        return
+
+    print('Benchmark group {}: {} benchmarks with environment samples'.format(
+        gid, len(cells)))
+    governors = sorted({str(cell['governor']) for cell in cells})
+    print('CPU frequency governors: ' + ', '.join(governors))
+
+    print('\nCorrelation of noise metrics with durations:')
+    print('metric,outliers,cv')
+    corrs = correlations(cells)
+    for m in NOISE_METRICS:
+        print('{},{:.2f},{:.2f}'.format(m, corrs.get((m, 'outliers'), np.nan),
+                                        corrs.get((m, 'cv'), np.nan)))
+
+    noisy = [cell for cell in cells
+             if is_noisy(cell, args.max_other_cpu, args.max_steal,
+                         args.min_mem, args.min_outliers)]
+    print('\nNoisy benchmarks: {}'.format(len(noisy)))
+    if noisy:
+        print('id,name,system,other_cpu,steal,mhz_drop,mem_free_mb,outliers,cv')
+    for cell in noisy:
+        print('{id},{name},{system},{other_cpu:.2f},{steal:.2f},{mhz_drop:.1f},'
+              '{mem_free_mb:.0f},{outliers:.2f},{cv:.3f}'.format(**cell))
+
+    if args.requeue and noisy:
+        requeue = sorted({'{}:{}'.format(cell['name'], cell['system'])
+                          for cell in noisy})
+        print('\nRe-run the noisy cells with:')
+        print('./scripts/runBenchmarks <repetitions> {} {}'.format(
+            gid, ' '.join(requeue)))
+
+
+if __name__ == "__main__":
+    main()
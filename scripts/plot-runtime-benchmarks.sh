@@ -5,3 +5,4 @@ mkdir -p graphs/time
 mkdir -p graphs/memory
 python3 state_machine_graph.py
 python3 gc_memory_vs_size.py
+python3 html_report.py
@@ -0,0 +1,125 @@
+# Effpi - verified message-passing programs in Dotty
+# Copyright 2019 Alceste Scalas and Elias Benussi
+# Released under the MIT License: https://opensource.org/licenses/MIT
+
+# Opt-in, stage-level profiling for the analysis scripts.
+#
+# A Profiler records nested stages (e.g., query, decode, aggregate, render,
+# write), each one tagged with arguments (e.g., benchmark and system), and
+# counting the DB rows it reads and the bytes of their values (see
+# value_bytes).  The recording is written as a
+# Chrome trace event JSON file (viewable with chrome://tracing, Perfetto or
+# speedscope), plus a ".folded" file with one line per stack, usable with
+# flamegraph.pl.  When disabled, stages are no-ops.
+import contextlib
+import json
+import os
+import threading
+import time
+
+# Bytes counted for each INTEGER or REAL value read from the DB
+NUMBER_BYTES = 8
+
+
+def value_bytes(v):
+    """Return the bytes of a value read from the DB: NUMBER_BYTES for
+    numbers, the length of BLOB and (UTF-8) TEXT values, 0 for NULL."""
+    if v is None:
+        return 0
+    if isinstance(v, bytes):
+        return len(v)
+    if isinstance(v, str):
+        return len(v.encode('utf-8'))
+    return NUMBER_BYTES
+
+
+def rows_bytes(rows):
+    """Return the bytes of all the values in the given DB rows."""
+    return sum(value_bytes(v) for r in rows for v in r)
+
+
+class Profiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.events = []
+        self._stack = []
+        self._t0 = time.perf_counter()
+
+    def stage(self, name, **args):
+        """Return a context manager timing a stage called `name`."""
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._stage(name, args)
+
+    @contextlib.contextmanager
+    def _stage(self, name, args):
+        # Stack frames are labelled with the stage arguments, e.g.
+        # "query(ring,akka)", to tell benchmarks and systems apart
+        label = '{}({})'.format(name, ','.join(str(v) for v in args.values()))
+        frame = {'label': label if args else name,
+                 'args': dict(args, rows=0, bytes=0), 'children': 0.0}
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            dur = time.perf_counter() - start
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1]['children'] += dur
+            self.events.append({
+                'name': name,
+                'stack': [f['label'] for f in self._stack] + [frame['label']],
+                'ts': (start - self._t0) * 1e6,
+                'dur': dur * 1e6,
+                'self': (dur - frame['children']) * 1e6,
+                'args': frame['args'],
+            })
+
+    def count(self, rows=0, nbytes=0):
+        """Add the given rows and bytes read to the current stage."""
+        if self.enabled and self._stack:
+            args = self._stack[-1]['args']
+            args['rows'] += rows
+            args['bytes'] += nbytes
+
+    def write(self, path):
+        """Write the recorded stages to `path` (Chrome trace event JSON) and
+        to `path` + ".folded" (folded stacks, in microseconds)."""
+        if not self.enabled:
+            return
+        pid, tid = os.getpid(), threading.get_ident()
+        trace = [{'name': e['name'], 'cat': 'analysis', 'ph': 'X',
+                  'ts': round(e['ts'], 3), 'dur': round(e['dur'], 3),
+                  'pid': pid, 'tid': tid, 'args': e['args']}
+                 for e in self.events]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+        folded = {}
+        for e in self.events:
+            key = ';'.join(e['stack'])
+            folded[key] = folded.get(key, 0) + e['self']
+        with open(path + '.folded', 'w') as f:
+            for key, us in sorted(folded.items()):
+                f.write('{} {}\n'.format(key, int(us)))
+
+    def summary(self):
+        """Return (stage, calls, seconds, rows, bytes) tuples, sorted by
+        decreasing time spent in the stage (excluding sub-stages)."""
+        stages = {}
+        for e in self.events:
+            s = stages.setdefault(e['name'], [0, 0.0, 0, 0])
+            s[0] += 1
+            s[1] += e['self'] / 1e6
+            s[2] += e['args']['rows']
+            s[3] += e['args']['bytes']
+        return sorted(((n,) + tuple(s) for n, s in stages.items()),
+                      key=lambda s: -s[2])
+
+    def print_summary(self):
+        if not self.enabled:
+            return
+        print('stage,calls,seconds,rows,bytes')
+        for name, calls, secs, rows, nbytes in self.summary():
+            print('{},{},{:.3f},{},{}'.format(name, calls, secs, rows, nbytes))
@@ -2,6 +2,7 @@
 # Effpi - verified message-passing programs in Dotty
 # Copyright 2019 Alceste Scalas and Elias Benussi
 # Released under the MIT License: https://opensource.org/licenses/MIT
+import argparse
 import itertools
 import operator
 from ast import literal_eval
@@ -9,6 +10,12 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.ticker import ScalarFormatter
 
+from archive_durations import (fetch_raw_durations, decode_durations,
+                                has_packed_table)
+from benchmark_db import SIZE_FIELDS, latest_group, group_filter
+import noise_report
+import profiling
+
 SQLITE_FILE = '../benchmarks.db'
 GENERAL_PLOTS_PATH = './graphs/time/'
 THREAD_PLOTS_PATH = './graphs/threadpercore/'
@@ -17,6 +24,15 @@ PS_PLOTS_PATH = './graphs/processsystem/'
 DATA_SIZE_PATH = '../benchmarkresults/size/'
 DATA_TPC_PATH = '../benchmarkresults/threads/'
 
+# Benchmark group to plot (see --group); None means the latest completed
+GROUP_ID = None
+
+# Benchmark ids to leave out of the plots (see --exclude-noisy)
+EXCLUDED_IDS = set()
+
+# Stage-level profiler (see --profile)
+PROFILER = profiling.Profiler(enabled=False)
+
 BENCHNAMES = [
     ("chameneos", "Number of chameneos", "Time (ms)"),
     ("counting", "Numbers to add", "Time (ms)"),
@@ -37,29 +53,32 @@ PSNAMES = [
 def plot_time_vs_size_general():
     for bn, xl, yl in BENCHNAMES:
         print('Generating size vs. time plot for benchmark: ' + bn)
-        plot_time_vs_size_general_per_benchmark(bn, xl, yl)
+        with PROFILER.stage('plot', benchmark=bn):
+            plot_time_vs_size_general_per_benchmark(bn, xl, yl)
 
 
 def plot_time_vs_size_general_per_benchmark(benchname, xl, yl):
-    f, ax = plt.subplots(figsize=(3.5, 3.5))
-    # ax.axis([1, 100000, 1, 1000000000000])
-
     # NOTE: using specific GID
     points = assemble_data(benchname, PSNAMES)
 
-    for psName, sizes, records, _e, psLabel, sty in points:
-        ax.loglog(sizes, records, marker='o', markersize=6, label=psLabel, linestyle=sty)
+    with PROFILER.stage('render', benchmark=benchname):
+        f, ax = plt.subplots(figsize=(3.5, 3.5))
+        # ax.axis([1, 100000, 1, 1000000000000])
+
+        for psName, sizes, records, _e, psLabel, sty in points:
+            ax.loglog(sizes, records, marker='o', markersize=6, label=psLabel, linestyle=sty)
 
-    # This allows to have log scale with normal values
-    # ax.xaxis.set_major_formatter(ScalarFormatter())
-    # ax.yaxis.set_major_formatter(ScalarFormatter())
+        # This allows to have log scale with normal values
+        # ax.xaxis.set_major_formatter(ScalarFormatter())
+        # ax.yaxis.set_major_formatter(ScalarFormatter())
 
-    plt.xlabel(xl, fontsize=12)
-    plt.ylabel(yl, fontsize=12)
-    plt.legend(loc="upper left")
+        plt.xlabel(xl, fontsize=12)
+        plt.ylabel(yl, fontsize=12)
+        plt.legend(loc="upper left")
 
-    f.savefig('{}{}.pdf'.format(GENERAL_PLOTS_PATH, benchname), bbox_inches='tight')
-    plt.close(f)
+    with PROFILER.stage('write', benchmark=benchname):
+        f.savefig('{}{}.pdf'.format(GENERAL_PLOTS_PATH, benchname), bbox_inches='tight')
+        plt.close(f)
 
 
 def assemble_data(benchname, PSNAMES, gid = None):
@@ -78,51 +97,50 @@ def fetch_data(bench_name, system, gid = None):
         conn.row_factory = sqlite3.Row
         c = conn.cursor()
 
-        if gid is None:
-            # Select the latest benchmark group id
-            c.execute("SELECT `id` FROM benchmark_group "
-                      "WHERE `end` IS NOT NULL "
-                      "ORDER BY `end` DESC LIMIT 1")
-            gid = c.fetchone()['id']
-
-        # Which DB field is the "size", for the x-axis of the plot?
-        size_fields = {
-            'chameneos' : 'size',
-            'counting' : 'count',
-            'pingpong' : 'pairs',
-            'forkjoin_creation' : 'size',
-            'forkjoin_throughput' : 'size',
-            'ring' : 'size',
-            'ringstream' : 'size'
-        }
-        size_field = size_fields[bench_name]
-
-        # Select id,size pairs for all benchmkars with given name and group
-        c.execute("SELECT benchmark.`id`, %(b)s.`%(f)s` "
-                  "FROM benchmark "
-                  "INNER JOIN %(b)s "
-                  "ON (benchmark.`id` = %(b)s.`id`) "
-                  "WHERE benchmark.`group` = ? AND benchmark.`name` = ? "
-                  "AND benchmark.`system` = ? "
-                  "AND benchmark.`type` = 'size_vs_time'" % {
-                      'b' : 'benchmark_' + bench_name,
-                      'f' : size_field
-                  },
-                  (gid, bench_name, system))
-        id_sizes = c.fetchall()
-        bench_ids = [r['id'] for r in id_sizes]
-        sizes = [r[size_field] for r in id_sizes]
-
-        tomillisecs = lambda r: r['nanoseconds'] / 1000000
-        records = [list(map(tomillisecs,
-                            c.execute("SELECT `nanoseconds` "
-                                      "FROM benchmark_duration "
-                                      "WHERE `benchmark_id` = ?",
-                                      (bid,)).fetchall()))
-                   for bid in bench_ids]
-
-        avg_records = [empty_safe_avg(r) for r in records]
-        errors = [empty_safe_std(r) for r in records]
+        with PROFILER.stage('query', benchmark=bench_name, system=system):
+            if gid is None:
+                gid = GROUP_ID if GROUP_ID is not None else latest_group(c)
+
+            # Which DB field is the "size", for the x-axis of the plot?
+            size_field = SIZE_FIELDS[bench_name]
+            group, group_params = group_filter(gid)
+
+            # Select id,size pairs for all benchmkars with given name and group
+            c.execute("SELECT benchmark.`id`, %(b)s.`%(f)s` "
+                      "FROM benchmark "
+                      "INNER JOIN %(b)s "
+                      "ON (benchmark.`id` = %(b)s.`id`) "
+                      "WHERE %(g)s AND benchmark.`name` = ? "
+                      "AND benchmark.`system` = ? "
+                      "AND benchmark.`type` = 'size_vs_time'" % {
+                          'b' : 'benchmark_' + bench_name,
+                          'f' : size_field,
+                          'g' : group
+                      },
+                      group_params + (bench_name, system))
+            rows = c.fetchall()
+            id_sizes = [r for r in rows if r['id'] not in EXCLUDED_IDS]
+            bench_ids = [r['id'] for r in id_sizes]
+            sizes = [r[size_field] for r in id_sizes]
+
+            # Durations may be stored one row per repetition, or packed by
+            # archive_durations.py
+            packed = has_packed_table(c)
+            raw = [fetch_raw_durations(c, bid, packed) for bid in bench_ids]
+            # Packed durations are one BLOB (i.e., row) per benchmark
+            durations = [[(r,)] if isinstance(r, bytes) else [(d,) for d in r]
+                         for r in raw]
+            PROFILER.count(
+                rows=len(rows) + sum(len(ds) for ds in durations),
+                nbytes=(profiling.rows_bytes(rows) +
+                        sum(profiling.rows_bytes(ds) for ds in durations)))
+
+        with PROFILER.stage('decode', benchmark=bench_name, system=system):
+            records = [list(decode_durations(r) / 1000000) for r in raw]
+
+        with PROFILER.stage('aggregate', benchmark=bench_name, system=system):
+            avg_records = [empty_safe_avg(r) for r in records]
+            errors = [empty_safe_std(r) for r in records]
 
         # return sizes, avg_records, errors, records
         return filter_out_empty_records(sizes, avg_records, errors, records)
@@ -139,13 +157,45 @@ def empty_safe_std(ls):
 def filter_out_empty_records(sizes, avg_rs, errs, rs):
     all_info = list(zip(sizes, avg_rs, errs, rs))
     filtered_info = [info for info in all_info if info[1] != -1]
+    if not filtered_info:
+        # E.g., all benchmarks excluded as noisy
+        return [], [], [], []
     unziped_info = list(zip(*filtered_info))
     return tuple([list(ui) for ui in unziped_info])
 
 
 def main():
+    global GROUP_ID, EXCLUDED_IDS, PROFILER
+
+    parser = argparse.ArgumentParser(description='Plot size vs. time')
+    parser.add_argument('--group', type=int,
+                        help='Benchmark group (default: latest completed)')
+    parser.add_argument('--exclude-noisy', action='store_true',
+                        help='Leave out the benchmarks reported as noisy '
+                        'by noise_report.py (with default thresholds)')
+    parser.add_argument('--profile', nargs='?', metavar='FILE',
+                        const='profile_state_machine_graph.json',
+                        help='Time each analysis stage, and write a trace '
+                        'to FILE (default: %(const)s)')
+    args = parser.parse_args()
+    GROUP_ID = args.group
+    PROFILER = profiling.Profiler(enabled=args.profile is not None)
+
+    if args.exclude_noisy:
+        import sqlite3
+        with sqlite3.connect('file:{}?mode=ro'.format(SQLITE_FILE), uri=True) as conn:
+            conn.row_factory = sqlite3.Row
+            c = conn.cursor()
+            gid = GROUP_ID if GROUP_ID is not None else latest_group(c)
+            EXCLUDED_IDS = noise_report.noisy_benchmark_ids(c, gid)
+        print('Excluding {} noisy benchmarks'.format(len(EXCLUDED_IDS)))
+
     plot_time_vs_size_general()
 
+    if args.profile is not None:
+        PROFILER.write(args.profile)
+        PROFILER.print_summary()
+
 
 if __name__ == "__main__":
     main()
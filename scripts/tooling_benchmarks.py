@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# Effpi - verified message-passing programs in Dotty
+# Copyright 2019 Alceste Scalas and Elias Benussi
+# Released under the MIT License: https://opensource.org/licenses/MIT
+
+# Benchmarks for the analysis tooling itself.
+#
+# The "generate" command fills a synthetic DB (with the schema in
+# benchmarks.sql) with the given number of groups, systems, sizes and
+# repetitions.  The "run" command times loading, aggregation and rendering
+# of state_machine_graph.py, gc_memory_vs_size.py and html_report.py on
+# such a DB, and appends the results to a CSV file, to track them over time.
+#
+# Usage:
+#   python3 tooling_benchmarks.py generate --db FILE [--groups G]
+#       [--systems S] [--sizes N] [--repetitions R] [--seed SEED]
+#   python3 tooling_benchmarks.py run --db FILE [--repeat K] [--results FILE]
+import argparse
+import csv
+import os
+import sqlite3
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+from benchmark_db import PARAM_FIELDS, latest_group
+import profiling
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'benchmarks.sql')
+RESULTS_FILE = './tooling_benchmarks.csv'
+
+# Value used for the parameters other than the size, for each benchmark
+# table (see PARAM_FIELDS)
+OTHER_PARAMS = {
+    'chameneos' : 100000,
+    'counting' : None,
+    'pingpong' : 100,
+    'forkjoin_creation' : None,
+    'forkjoin_throughput' : 500,
+    'ring' : 150000,
+    'ringstream' : 1000,
+}
+
+# Systems known by the plotting scripts; further systems get synthetic names
+SYSTEMS = ['akka', 'statemachinemultistep', 'runnerimproved']
+
+GCS = ['G1 Young Generation', 'G1 Old Generation']
+
+# Rows inserted by each executemany() call
+BATCH_SIZE = 100000
+
+
+def batched(rows, n=BATCH_SIZE):
+    batch = []
+    for r in rows:
+        batch.append(r)
+        if len(batch) == n:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate(db, groups, nsystems, nsizes, repetitions, seed):
+    rng = np.random.default_rng(seed)
+    systems = (SYSTEMS + ['system{}'.format(i)
+                          for i in range(len(SYSTEMS), nsystems)])[:nsystems]
+    sizes = np.unique(np.geomspace(2, 1000000, nsizes).astype(int)).tolist()
+
+    if os.path.exists(db):
+        os.remove(db)
+    conn = sqlite3.connect(db)
+    with open(SCHEMA_FILE) as f:
+        conn.executescript(f.read())
+    c = conn.cursor()
+
+    benchmarks = []
+    params = {b: [] for b in PARAM_FIELDS}
+    bid = 0
+    with conn:
+        for g in range(groups):
+            start = 1000000 * g
+            c.execute("INSERT INTO benchmark_group (`description`, `start`, `end`) "
+                      "VALUES (?, ?, ?)",
+                      ('Synthetic group {}'.format(g), start, start + 1000))
+            gid = c.lastrowid
+            for name, fields in PARAM_FIELDS.items():
+                for system in systems:
+                    for btype in ['size_vs_time', 'size_vs_memory']:
+                        for size in sizes:
+                            bid += 1
+                            benchmarks.append((bid, gid, btype, name, system,
+                                               start, start + 1000, size))
+                            params[name].append(
+                                [bid, name, size] +
+                                [OTHER_PARAMS[name]] * (len(fields) - 1))
+
+        c.executemany("INSERT INTO benchmark (`id`, `group`, `type`, `name`, "
+                      "`system`, `start`, `end`) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                      (b[:7] for b in benchmarks))
+        for name, fields in PARAM_FIELDS.items():
+            c.executemany("INSERT INTO benchmark_%s (`id`, `name`, %s) "
+                          "VALUES (?, ?, %s)" % (
+                              name, ', '.join('`%s`' % f for f in fields),
+                              ', '.join('?' * len(fields))),
+                          params[name])
+
+        def durations():
+            for b in benchmarks:
+                if b[2] != 'size_vs_time':
+                    continue
+                ns = rng.lognormal(np.log(b[7] * 10000.0), 0.2, repetitions)
+                for rep, v in enumerate(ns.astype(np.int64).tolist(), start=1):
+                    yield (b[0], 'size_vs_time', rep, v)
+
+        def memory():
+            for b in benchmarks:
+                if b[2] != 'size_vs_memory':
+                    continue
+                for gc in GCS:
+                    yield (b[0], 'size_vs_memory', 1, gc,
+                           int(rng.integers(1, 100)),
+                           int(b[7] * 1000 * rng.uniform(0.5, 1.5)))
+
+        for batch in batched(durations()):
+            c.executemany("INSERT INTO benchmark_duration (`benchmark_id`, "
+                          "`benchmark_type`, `repetition`, `nanoseconds`) "
+                          "VALUES (?, ?, ?, ?)", batch)
+        for batch in batched(memory()):
+            c.executemany("INSERT INTO benchmark_memory (`benchmark_id`, "
+                          "`benchmark_type`, `repetition`, `gc`, `calls`, "
+                          "`max_bytes`) VALUES (?, ?, ?, ?, ?, ?)", batch)
+    conn.close()
+    print('Generated {}: {} groups, {} systems, {} sizes, {} repetitions '
+          '({} benchmarks)'.format(db, groups, len(systems), len(sizes),
+                                   repetitions, len(benchmarks)))
+
+
+def db_rows(db):
+    with sqlite3.connect('file:{}?mode=ro'.format(db), uri=True) as conn:
+        return conn.execute("SELECT COUNT(*) FROM benchmark_duration").fetchone()[0]
+
+
+def time_plotting_script(module, outdir_attr, plot, db, outdir):
+    """Run `plot()` from the given plotting script module with the stage
+    profiler enabled.  Return a map from loading/aggregation/rendering to
+    seconds."""
+    module.SQLITE_FILE = db
+    setattr(module, outdir_attr, outdir + os.sep)
+    module.PROFILER = profiling.Profiler(enabled=True)
+    plot()
+    secs = {stage: s for stage, _calls, s, _rows, _bytes
+            in module.PROFILER.summary()}
+    module.PROFILER = profiling.Profiler(enabled=False)
+    return {
+        'loading': secs.get('query', 0.0) + secs.get('decode', 0.0),
+        'aggregation': secs.get('aggregate', 0.0),
+        'rendering': secs.get('render', 0.0) + secs.get('write', 0.0),
+    }
+
+
+def time_html_report(db, outdir):
+    import html_report
+    t0 = time.perf_counter()
+    with sqlite3.connect('file:{}?mode=ro'.format(db), uri=True) as conn:
+        c = conn.cursor()
+        samples = html_report.fetch_samples(c, latest_group(c))
+    t1 = time.perf_counter()
+    summary = html_report.summarise(samples, html_report.BASELINE)
+    t2 = time.perf_counter()
+    with open(os.path.join(outdir, 'report.html'), 'w') as f:
+        f.write(html_report.render(0, summary, html_report.BASELINE))
+    t3 = time.perf_counter()
+    return {'loading': t1 - t0, 'aggregation': t2 - t1, 'rendering': t3 - t2}
+
+
+def run_suite(db):
+    """Run all tooling benchmarks once: return (tool, phase, seconds)."""
+    import state_machine_graph
+    import gc_memory_vs_size
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='effpi-tooling-') as outdir:
+        tools = [
+            ('state_machine_graph',
+             lambda: time_plotting_script(
+                 state_machine_graph, 'GENERAL_PLOTS_PATH',
+                 state_machine_graph.plot_time_vs_size_general, db, outdir)),
+            ('gc_memory_vs_size',
+             lambda: time_plotting_script(
+                 gc_memory_vs_size, 'BAR_PLOTS_PATH',
+                 gc_memory_vs_size.gc_usage_vs_size, db, outdir)),
+            ('html_report', lambda: time_html_report(db, outdir)),
+        ]
+        for tool, fun in tools:
+            for phase, secs in fun().items():
+                results.append((tool, phase, secs))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def previous_results(path, rows):
+    """Return the latest recorded seconds for each (tool, phase), among the
+    results obtained with a DB having the given number of rows."""
+    prev = {}
+    if not os.path.exists(path):
+        return prev
+    with open(path, newline='') as f:
+        for r in csv.DictReader(f):
+            if int(r['db_rows']) == rows:
+                prev[(r['tool'], r['phase'])] = float(r['seconds'])
+    return prev
+
+
+def run(db, repeat, results_file):
+    rows = db_rows(db)
+    prev = previous_results(results_file, rows)
+
+    # Keep the best time of each (tool, phase) over all repetitions
+    best = {}
+    for _ in range(repeat):
+        for tool, phase, secs in run_suite(db):
+            best[(tool, phase)] = min(secs, best.get((tool, phase), secs))
+
+    timestamp = int(time.time() * 1000)
+    commit = git_commit()
+    new_file = not os.path.exists(results_file)
+    with open(results_file, 'a', newline='') as f:
+        w = csv.writer(f)
+        if new_file:
+            w.writerow(['timestamp', 'commit', 'db_rows', 'tool', 'phase',
+                        'seconds'])
+        for (tool, phase), secs in best.items():
+            w.writerow([timestamp, commit, rows, tool, phase, '%.4f' % secs])
+
+    print('tool,phase,seconds,previous,ratio')
+    for (tool, phase), secs in best.items():
+        p = prev.get((tool, phase))
+        print('{},{},{:.4f},{},{}'.format(
+            tool, phase, secs,
+            'N/A' if p is None else '%.4f' % p,
+            'N/A' if not p else '%.2f' % (secs / p)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the analysis tooling on synthetic data')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_gen = sub.add_parser('generate', help='Generate a synthetic DB')
+    p_gen.add_argument('--db', required=True, help='DB file (overwritten)')
+    p_gen.add_argument('--groups', type=int, default=1)
+    p_gen.add_argument('--systems', type=int, default=len(SYSTEMS))
+    p_gen.add_argument('--sizes', type=int, default=10)
+    p_gen.add_argument('--repetitions', type=int, default=100)
+    p_gen.add_argument('--seed', type=int, default=0)
+
+    p_run = sub.add_parser('run', help='Time the tooling on a DB')
+    p_run.add_argument('--db', required=True, help='DB file')
+    p_run.add_argument('--repeat', type=int, default=3,
+                       help='Repetitions, keeping the best time '
+                       '(default: %(default)s)')
+    p_run.add_argument('--results', default=RESULTS_FILE,
+                       help='CSV file with results over time '
+                       '(default: %(default)s)')
+
+    args = parser.parse_args()
+    if args.command == 'generate':
+        generate(args.db, args.groups, args.systems, args.sizes,
+                 args.repetitions, args.seed)
+    else:
+        run(args.db, args.repeat, args.results)
+
+
+if __name__ == "__main__":
+    main()
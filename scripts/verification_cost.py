@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# Effpi - verified message-passing programs in Dotty
+# Copyright 2019 Alceste Scalas and Elias Benussi
+# Released under the MIT License: https://opensource.org/licenses/MIT
+
+# Predict the cost of mCRL2 verification for unseen instance sizes.
+#
+# Reads the benchmark-<spec>-<property>.csv files written by the compiler
+# plugin (the same files read by collectPluginBenchmarks), groups the specs
+# into families (e.g., ring10 and ring15 belong to family ring{n}), and fits
+# the number of states and the verification time as functions of the
+# instance size.  The fitted models are used to predict the cost of other
+# sizes, flagging the ones whose projected time exceeds a budget.
+#
+# Usage:
+#   python3 verification_cost.py [--csv-dir DIR ...] [--predict SPEC ...]
+#                                [--budget SECS] [--model exp|power]
+#
+# Exits with status 1 if some prediction exceeds the budget, or with status
+# 3 if some spec cannot be predicted (e.g., if its family was measured at
+# only one size).
+import argparse
+import csv
+import glob
+import os
+import re
+import sys
+import tempfile
+import numpy as np
+
+# Default time budget for verifying a (spec, property) pair, in seconds
+BUDGET_SECS = 600
+
+# Spec name: <family prefix><size><family suffix>, e.g. "dining4_df"
+SPEC_REGEX = re.compile(r'^([a-z]+?)(\d+)(.*)$')
+
+
+def csv_files(dirs):
+    """Return a map from CSV file names to their path.  If `dirs` is empty,
+    scan the "effpi-*" temporary directories (the newest file wins)."""
+    if not dirs:
+        dirs = glob.glob(os.path.join(tempfile.gettempdir(), 'effpi-*'))
+    paths = [p for d in dirs for p in glob.glob(os.path.join(d, '*.csv'))]
+    latest = {}
+    for p in sorted(paths, key=os.path.getmtime):
+        latest[os.path.basename(p)] = p
+    return latest
+
+
+def split_spec(spec):
+    """Split a spec name into (family, size), e.g. "ring10tok3" becomes
+    ("ring{n}tok3", 10).  Return None if the spec has no size."""
+    m = SPEC_REGEX.match(spec)
+    if m is None:
+        return None
+    prefix, size, suffix = m.groups()
+    return (prefix + '{n}' + suffix, int(size))
+
+
+def load_results(files):
+    """Return two maps: from spec to number of states (when known), and
+    from (spec, property) to the list of verification times (in seconds)."""
+    states = {}
+    times = {}
+    for filename, path in files.items():
+        parts = filename[:-len('.csv')].split('-')
+        if len(parts) != 3 or parts[0] != 'benchmark':
+            continue
+        _, spec, prop = parts
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        if not rows:
+            continue
+        if rows[0]['states'] != '∞':
+            states[spec] = int(rows[0]['states'])
+        times[(spec, prop)] = [int(r['nanosecs']) / 1e9 for r in rows]
+    return states, times
+
+
+def fit(sizes, values, model):
+    """Fit `values` as a function of `sizes`, and return the fitted function.
+    The "exp" model is log(v) = a + b*n; the "power" model is
+    log(v) = a + b*log(n).  Return None with less than 2 distinct sizes."""
+    if len(set(sizes)) < 2:
+        return None
+    x = np.asarray(sizes, dtype=float)
+    if model == 'power':
+        x = np.log(x)
+    b, a = np.polyfit(x, np.log(np.asarray(values, dtype=float)), 1)
+    if model == 'power':
+        return lambda n: float(np.exp(a + b * np.log(n)))
+    return lambda n: float(np.exp(a + b * n))
+
+
+def fit_families(states, times, model):
+    """Fit the models for each family.  Return two maps: from family to
+    state-count model, and from (family, property) to time model.  Families
+    that cannot be fitted (i.e., measured at less than 2 sizes) are
+    omitted."""
+    fam_states = {}
+    for spec, st in states.items():
+        fs = split_spec(spec)
+        if fs is not None:
+            fam_states.setdefault(fs[0], []).append((fs[1], st))
+
+    fam_times = {}
+    for (spec, prop), ts in times.items():
+        fs = split_spec(spec)
+        if fs is not None:
+            fam_times.setdefault((fs[0], prop), []).append((fs[1], np.mean(ts)))
+
+    def fit_all(fam_pts):
+        models = {k: fit(*zip(*pts), model) for k, pts in fam_pts.items()}
+        return {k: m for k, m in models.items() if m is not None}
+    return fit_all(fam_states), fit_all(fam_times)
+
+
+def default_predictions(times):
+    """For each family, predict the size following the largest one measured
+    (using the step between the two largest sizes)."""
+    sizes = {}
+    for (spec, _prop) in times:
+        fs = split_spec(spec)
+        if fs is not None:
+            sizes.setdefault(fs[0], set()).add(fs[1])
+    specs = []
+    for family, ss in sorted(sizes.items()):
+        ss = sorted(ss)
+        if len(ss) >= 2:
+            specs.append(family.format(n=(2 * ss[-1] - ss[-2])))
+    return specs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Predict mCRL2 verification cost for unseen spec sizes')
+    parser.add_argument('--csv-dir', action='append', default=[],
+                        help='Directory with benchmark-<spec>-<prop>.csv '
+                        'files (default: effpi-* temporary directories)')
+    parser.add_argument('--predict', action='append', default=[],
+                        metavar='SPEC',
+                        help='Spec to predict, e.g. ring15 (default: next '
+                        'size of each family)')
+    parser.add_argument('--budget', type=float, default=BUDGET_SECS,
+                        help='Time budget per property, in seconds '
+                        '(default: %(default)s)')
+    parser.add_argument('--model', choices=['exp', 'power'], default='exp',
+                        help='Growth model (default: %(default)s)')
+    args = parser.parse_args()
+
+    states, times = load_results(csv_files(args.csv_dir))
+    if not times:
+        print('No benchmark results found', file=sys.stderr)
+        sys.exit(2)
+
+    state_models, time_models = fit_families(states, times, args.model)
+    fam_props = {}
+    for (s, p) in times:
+        fs = split_spec(s)
+        if fs is not None:
+            fam_props.setdefault(fs[0], set()).add(p)
+    specs = args.predict or default_predictions(times)
+
+    over_budget, unpredictable = [], []
+    print('spec,property,predicted_states,predicted_secs,over_budget')
+    for spec in specs:
+        fs = split_spec(spec)
+        if fs is None:
+            print('Cannot find the size of spec: ' + spec, file=sys.stderr)
+            unpredictable.append((spec, None))
+            continue
+        family, size = fs
+        if family not in fam_props:
+            unpredictable.append((spec, None))
+            continue
+        st_model = state_models.get(family)
+        st = 'N/A' if st_model is None else '%d' % st_model(size)
+        for prop in sorted(fam_props[family]):
+            t_model = time_models.get((family, prop))
+            if t_model is None:
+                unpredictable.append((spec, prop))
+                continue
+            secs = t_model(size)
+            over = secs > args.budget
+            if over:
+                over_budget.append((spec, prop))
+            print('{},{},{},{:.2f},{}'.format(spec, prop, st, secs, over))
+
+    if unpredictable:
+        print('\nCannot predict (no size, or family measured at less than '
+              '2 sizes):', file=sys.stderr)
+        for spec, prop in unpredictable:
+            print('  {}'.format(spec) +
+                  ('' if prop is None else ' ({})'.format(prop)),
+                  file=sys.stderr)
+    if over_budget:
+        print('\nProjected time exceeds {}s budget for:'.format(args.budget),
+              file=sys.stderr)
+        for spec, prop in over_budget:
+            print('  {} ({})'.format(spec, prop), file=sys.stderr)
+        sys.exit(1)
+    if unpredictable:
+        sys.exit(3)
+
+
+if __name__ == "__main__":
+    main()
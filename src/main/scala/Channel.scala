@@ -8,6 +8,7 @@ import java.util.concurrent.atomic.AtomicInteger
 
 import scala.concurrent.duration.Duration
 import effpi.process.{ProcVar, Process, In}
+import effpi.system.RuntimeStats
 
 object ChannelStatus {
   val unscheduled = 0
@@ -120,6 +121,8 @@ trait QueueInChannel[+A](q: LTQueue[A],
 
   private val pendingInProcesses = new LTQueue[(Map[ProcVar[_], (_) => Process], List[() => Process], In[InChannel[Any], Any, Any => Process])]()
 
+  if (RuntimeStats.enabled) RuntimeStats.inChannels.increment()
+
   override def receive()(implicit timeout: Duration) = {
     if (!timeout.isFinite) {
       q.take()
@@ -137,11 +140,16 @@ trait QueueInChannel[+A](q: LTQueue[A],
     case head => Some(head)
   }
 
-  override def enqueue(i: (Map[ProcVar[_], (_) => Process], List[() => Process], In[InChannel[Any], Any, Any => Process])): Unit = pendingInProcesses.add(i)
+  override def enqueue(i: (Map[ProcVar[_], (_) => Process], List[() => Process], In[InChannel[Any], Any, Any => Process])): Unit = {
+    if (RuntimeStats.enabled) RuntimeStats.pendingInputs.increment()
+    pendingInProcesses.add(i)
+  }
 
   override def dequeue() = pendingInProcesses.poll() match {
     case null => None
-    case head => Some(head)
+    case head =>
+      if (RuntimeStats.enabled) RuntimeStats.pendingInputs.decrement()
+      Some(head)
   }
 
   override def waiting: Boolean = !pendingInProcesses.isEmpty
@@ -3,7 +3,8 @@
 // Released under the MIT License: https://opensource.org/licenses/MIT
 package effpi.system
 
-import java.util.concurrent.Executors
+import java.util.concurrent.{ConcurrentLinkedQueue, Executors}
+import java.lang.management.ManagementFactory
 
 import scala.util.{Failure, Success, Try}
 import scala.concurrent.duration.Duration
@@ -17,6 +18,23 @@ trait ProcessSystem {
   var alive = true
   val threads = scala.collection.mutable.ArrayBuffer.empty[Thread]
 
+  // CPU time (in nanoseconds) used by each thread in `threads`, added when
+  // the thread terminates (i.e., complete after `kill()`).  Empty if the JVM
+  // does not support measuring thread CPU time.
+  val threadCpuTimes = new ConcurrentLinkedQueue[Long]()
+
+  protected def newThread(r: Runnable): Thread = new Thread(new Runnable {
+    override def run() = {
+      try r.run() finally {
+        val bean = ManagementFactory.getThreadMXBean
+        if (bean.isCurrentThreadCpuTimeSupported) {
+          val cpuTime = bean.getCurrentThreadCpuTime
+          if (cpuTime >= 0) threadCpuTimes.add(cpuTime) // -1 if disabled
+        }
+      }
+    }
+  })
+
   def kill(): Unit = {
     alive = false
     threads.foreach { t => t.interrupt() }
@@ -88,11 +106,11 @@ class ProcessSystemRunnerImproved extends ProcessSystem {
     val numThreads = numCores * threadsPerCore
 
     (1 to numThreads).foreach { c =>
-      threads += new Thread(new Executor(this))
+      threads += newThread(new Executor(this))
     }
 
     (1 to numThreads).foreach { c =>
-      threads += new Thread(new InputExecutor(this))
+      threads += newThread(new InputExecutor(this))
     }
 
     // threads += new Thread { override def run = logQueuesStatus() }
@@ -121,11 +139,11 @@ class ProcessSystemStateMachineMultiStep extends ProcessSystem {
     val numThreads = numCores * threadsPerCore
 
     (1 to numThreads).foreach { c =>
-      threads += new Thread(new Executor(this))
+      threads += newThread(new Executor(this))
     }
 
     (1 to numThreads).foreach { c =>
-      threads += new Thread(new InputExecutor(this))
+      threads += newThread(new InputExecutor(this))
     }
 
     // threads += new Thread { override def run = logQueuesStatus() }
@@ -0,0 +1,23 @@
+// Effpi - verified message-passing programs in Dotty
+// Copyright 2019 Alceste Scalas and Elias Benussi
+// Released under the MIT License: https://opensource.org/licenses/MIT
+package effpi.system
+
+import java.util.concurrent.atomic.LongAdder
+
+/** Optional runtime statistics, e.g. for sampling scheduler and channel
+  * backlogs while benchmarking.
+  *
+  * Statistics are disabled by default, and counters are only updated when
+  * `enabled` is set: this must happen before creating any process system or
+  * channel.  Counters are global, and cumulative since they were enabled.
+  */
+object RuntimeStats {
+  var enabled = false
+
+  /** Input processes waiting on a queue-based channel */
+  val pendingInputs = new LongAdder()
+
+  /** Queue-based input channels created */
+  val inChannels = new LongAdder()
+}
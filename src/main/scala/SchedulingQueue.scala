@@ -4,6 +4,7 @@
 package effpi.system
 
 import java.util.concurrent.{LinkedTransferQueue => LTQueue}
+import java.util.concurrent.atomic.LongAdder
 
 import scala.util.{Try, Success, Failure}
 import scala.collection.mutable.Queue
@@ -16,6 +17,12 @@ class SchedulingQueue[E] {
 
   def size = queue.size()
 
+  // Number of queued elements, only maintained if RuntimeStats are enabled
+  // (unlike `size`, it is read in constant time)
+  private val counter = new LongAdder()
+
+  def backlog: Long = counter.sum()
+
 //TODO: you might need a method to put elements in front for when you are
 // recovering from the sleeping map. otherwise you might wake it up, enqueue
 // it, then some process before steals their value and it forces it back to
@@ -28,11 +35,16 @@ class SchedulingQueue[E] {
     //}
     // TODO: this return a boolean to check success, perhaps you should wrap
     // this in a try
+    if (RuntimeStats.enabled) counter.increment() // Before it can be dequeued
     queue.add(elem)
   }
 
   def dequeue(): Option[E] = {
-    try { Some(queue.take()) } catch {
+    try {
+      val elem = queue.take()
+      if (RuntimeStats.enabled) counter.decrement()
+      Some(elem)
+    } catch {
         case e: InterruptedException =>
           None
       }